@@ -0,0 +1,146 @@
+"""
+hint_utils 의 조합 탐색에서 Region 을 만드는 비용을 재는 벤치마크.
+
+    python -m benchmarks.hint_search --regions 200 --pair-regions 60
+
+8x8 판 위에 이웃 칸 묶음으로 만든 임의의 region 들로 find_triple_inclusions,
+find_two_pairs_inequalities 를 돌립니다. 예전처럼 pydantic 으로 검증하는
+PydanticRegion 과 지금의 Region 을 hint_utils 에 번갈아 넣어 탐색 시간을 재고,
+합친 region 하나를 만드는 시간과 tracemalloc 으로 잰 메모리도 비교합니다.
+찾은 힌트는 둘이 같아야 합니다.
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from pydantic import BaseModel
+
+from window import hint_utils
+from window.region import Region
+
+SEARCHES = {
+    "triple_inclusions": hint_utils.find_triple_inclusions,
+    "two_pairs": hint_utils.find_two_pairs_inequalities,
+}
+
+
+class PydanticRegion(BaseModel):
+    """예전 Region 과 같은 pydantic 모델 (비교용)"""
+
+    mines_needed: int
+    blank_cells: set[tuple[int, int]]
+
+    @property
+    def total_blanks(self) -> int:
+        return len(self.blank_cells)
+
+    @property
+    def numbers_needed(self) -> int:
+        return self.total_blanks - self.mines_needed
+
+    def __eq__(self, other) -> bool:
+        return self.blank_cells == other.blank_cells
+
+
+def make_regions(count, size=8, seed=0) -> list[tuple[int, set[tuple[int, int]]]]:
+    """숫자칸 주변처럼 한 칸 둘레의 칸들을 몇 개 골라 region 을 만듭니다"""
+    rng = random.Random(seed)
+    regions = []
+    for _ in range(count):
+        row, col = rng.randrange(size), rng.randrange(size)
+        around = [
+            (row + dr, col + dc)
+            for dr in [-1, 0, 1]
+            for dc in [-1, 0, 1]
+            if (dr or dc) and 0 <= row + dr < size and 0 <= col + dc < size
+        ]
+        cells = set(rng.sample(around, rng.randint(2, min(5, len(around)))))
+        regions.append((rng.randint(0, len(cells)), cells))
+    return regions
+
+
+@contextmanager
+def region_class(cls):
+    original = hint_utils.Region
+    hint_utils.Region = cls
+    try:
+        yield
+    finally:
+        hint_utils.Region = original
+
+
+def run_search(search, cls, specs) -> dict:
+    regions = [cls(mines_needed=mines, blank_cells=cells) for mines, cells in specs]
+    with region_class(cls):
+        start = time.perf_counter()
+        hints = search(regions)
+        elapsed = time.perf_counter() - start
+    return {"seconds": elapsed, "hints": hints}
+
+
+def run_constructions(cls, specs, count) -> dict:
+    """find_triple_inclusions 처럼 두 region 을 합친 region 을 count 개 만들어 둡니다"""
+    regions = [cls(mines_needed=mines, blank_cells=cells) for mines, cells in specs]
+    pairs = [
+        (regions[i % len(regions)], regions[i * 7 % len(regions)]) for i in range(count)
+    ]
+    tracemalloc.start()
+    start = time.perf_counter()
+    merged = [
+        cls(
+            mines_needed=r1.mines_needed + r2.mines_needed,
+            blank_cells=r1.blank_cells | r2.blank_cells,
+        )
+        for r1, r2 in pairs
+    ]
+    elapsed = time.perf_counter() - start
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "us_per_region": elapsed / len(merged) * 1e6,
+        "bytes_per_region": retained / len(merged),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--regions", type=int, default=200)
+    parser.add_argument("--pair-regions", type=int, default=60)
+    parser.add_argument("--constructions", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    counts = {"triple_inclusions": args.regions, "two_pairs": args.pair_regions}
+    results = {}
+    for name, search in SEARCHES.items():
+        specs = make_regions(counts[name], seed=args.seed)
+        results[name] = {
+            cls.__name__: run_search(search, cls, specs)
+            for cls in [PydanticRegion, Region]
+        }
+        old, new = results[name]["PydanticRegion"], results[name]["Region"]
+        assert old["hints"] == new["hints"]
+        print(f"[{name}] {counts[name]} regions, {len(new['hints'])} hints")
+        for label, result in results[name].items():
+            print(f"  {label:15s} {result['seconds'] * 1000:8.1f} ms")
+        print(f"  speedup x{old['seconds'] / new['seconds']:.1f}")
+
+    specs = make_regions(args.regions, seed=args.seed)
+    results["constructions"] = {
+        cls.__name__: run_constructions(cls, specs, args.constructions)
+        for cls in [PydanticRegion, Region]
+    }
+    print(f"[constructions] {args.constructions} merged regions")
+    for label, result in results["constructions"].items():
+        print(
+            f"  {label:15s} {result['us_per_region']:6.2f} us"
+            f"  {result['bytes_per_region']:6.0f} bytes per region"
+        )
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+게임 창 없이 캡쳐 -> 상태 확인 -> 인식 -> 풀이 루프 전체를 재는 벤치마크.
+
+    python -m benchmarks.loop --repeat 20 --backend replay synthetic
+
+MyWindow.process_game_data 와 같은 solve_iteration 을 클릭 없이 돌립니다.
+replay 는 corpus 스크린샷의 판 픽셀을 그대로, synthetic 은 corpus 의 grid 를 템플릿으로
+다시 그린 프레임을 씁니다. corpus 의 size_skipper 캡쳐는 all solved / 빨리감기 표시가
+있는 화면이라 두 백엔드 모두 상태 확인하는 점들을 지워서 아직 푸는 중인 화면으로 만듭니다.
+--replay-directory 로 dump 해 둔 PNG 폴더를 그대로 돌릴 수도 있습니다.
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.recognition import load_corpus_frames
+from window.capture import ReplayCapture, Snapshot, SyntheticCapture, WindowGeometry
+from window.image_utils import (
+    GridRecognizer,
+    PuzzleStatus,
+    all_solved_probe_table,
+    status_probe_table,
+)
+from window.utils import ITERATION_STAGES, solve_iteration
+
+STAGES = ITERATION_STAGES
+UNSOLVED_PROBE_COLOR = (64, 64, 64)
+
+
+def get_in_progress_frame(frame) -> np.ndarray:
+    """상태 확인하는 점들을 어느 색과도 안 맞는 회색으로 지워서 루프가 멈추지 않게 합니다"""
+    frame = frame.copy()
+    for probe_table in [all_solved_probe_table, status_probe_table]:
+        for x1, y1, x2, y2 in probe_table.get_regions():
+            frame[y1:y2, x1:x2] = UNSOLVED_PROBE_COLOR
+    return frame
+
+
+def make_backend(name, entry, fps=None, replay_directory=None):
+    if name == "replay":
+        if replay_directory:
+            return ReplayCapture.from_directory(replay_directory, fps)
+        return ReplayCapture([get_in_progress_frame(entry["frame"])], fps)
+    elif name == "synthetic":
+        return SyntheticCapture(
+            entry["window_title"],
+            entry["rule"],
+            [entry["grid"]],
+            background=get_in_progress_frame(entry["frame"]),
+            fps=fps,
+        )
+    raise ValueError(f"unknown capture backend: {name}")
+
+
+def check_status(window_title, snapshot):
+    return snapshot.probe(status_probe_table)
+
+
+def run_loop(
+    backend, window_title, rule, repeat, recognizer=None, expected_grid=None
+) -> dict:
+    """
+    backend 에서 repeat 장을 받아 단계별 지연시간과 찾은 힌트 수를 잽니다.
+    all solved 나 이미 푼 문제라서 인식 전에 멈춘 바퀴는 stopped 로만 셉니다.
+    expected_grid 를 주면 인식 결과가 그와 다른 바퀴를 wrong_grids 로 셉니다.
+    """
+    if recognizer is None:
+        recognizer = GridRecognizer()
+    geometry = WindowGeometry(window_title)
+    timings = {stage: [] for stage in STAGES}
+    loop_latencies = []
+    hint_counts = []
+    stopped = 0
+    wrong_grids = 0
+    snapshot = Snapshot(window_title, backend=backend)
+    for _ in range(repeat):
+        ## 클릭 대신 상태만 확인하고, process_hints 처럼 매번 다시 찍게 합니다
+        snapshot.invalidate()
+        marks = [time.perf_counter()]
+        result = solve_iteration(
+            window_title,
+            rule,
+            snapshot,
+            geometry,
+            recognizer,
+            check_status=check_status,
+            marks=marks,
+        )
+        if result.all_solved or result.status == PuzzleStatus.ALREADY_SOLVED:
+            stopped += 1
+            continue
+        if result.frame is None:
+            break
+        for stage, start, end in zip(STAGES, marks, marks[1:]):
+            timings[stage].append(end - start)
+        loop_latencies.append(marks[-1] - marks[0])
+        hint_counts.append(len(result.hints))
+        if expected_grid is not None and result.grid != expected_grid:
+            wrong_grids += 1
+
+    def p50_ms(values):
+        return float(np.percentile(np.array(values) * 1000, 50)) if values else 0.0
+
+    return {
+        "loops": len(loop_latencies),
+        "stopped": stopped,
+        "wrong_grids": wrong_grids,
+        "stages_p50_ms": {stage: p50_ms(timings[stage]) for stage in STAGES},
+        "loop_p50_ms": p50_ms(loop_latencies),
+        "loops_per_second": (
+            len(loop_latencies) / sum(loop_latencies) if loop_latencies else 0.0
+        ),
+        "hints": hint_counts,
+    }
+
+
+def print_report(title, result):
+    print(
+        f"[{title}] {result['loops']} loops, {result['stopped']} stopped before recognition"
+    )
+    print(
+        "  "
+        + " / ".join(
+            f"{stage} {ms:.2f} ms" for stage, ms in result["stages_p50_ms"].items()
+        )
+    )
+    print(
+        f"  loop p50 {result['loop_p50_ms']:.2f} ms"
+        f" ({result['loops_per_second']:.1f} loops/s)"
+    )
+    if result["hints"]:
+        print(f"  hints per loop {result['hints'][0]}")
+    if result["wrong_grids"]:
+        print(
+            f"  recognized grid differs from the corpus in {result['wrong_grids']} loops"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument(
+        "--backend", nargs="*", default=["replay", "synthetic"], dest="backends"
+    )
+    parser.add_argument("--fps", type=float, default=None)
+    parser.add_argument("--replay-directory", default=None)
+    args = parser.parse_args(argv)
+
+    results = {}
+    for entry in load_corpus_frames():
+        for backend_name in args.backends:
+            backend = make_backend(backend_name, entry, args.fps, args.replay_directory)
+            title = f"{backend_name} {entry['name']}"
+            dumped = backend_name == "replay" and args.replay_directory
+            results[title] = run_loop(
+                backend,
+                entry["window_title"],
+                entry["rule"],
+                args.repeat,
+                expected_grid=None if dumped else entry["grid"],
+            )
+            print_report(title, results[title])
+    return results
+
+
+if __name__ == "__main__":
+    main()
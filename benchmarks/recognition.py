@@ -0,0 +1,369 @@
+"""
+게임 창 없이 셀 인식 속도와 정확도를 재는 벤치마크.
+
+    python -m benchmarks.recognition --repeat 20
+
+corpus/manifest.json 의 실제 스크린샷과, 템플릿을 붙여서 만든 합성 스크린샷
+(두 창 x 5~8 크기 x V/W/N 템플릿 폴더) 을 같이 씁니다.
+합성 스크린샷은 실제 캡쳐를 배경으로 깔고 템플릿을 그대로 붙인 것이라 오인식이 0 이어야
+하고, 0 이 아니면 인식이 망가진 것입니다. --stress 를 주면 판 전체를 몇 픽셀 밀고
+픽셀마다 노이즈를 더해서 템플릿과 다른 화면에서 얼마나 버티는지 봅니다.
+정확도는 실제/합성을 따로 보고합니다.
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from window.image_utils import (
+    FINGERPRINT_TOP_K,
+    CellRecognitionCache,
+    TemplateBank,
+    capture_window_screenshot,
+    convert_to_numeric,
+    find_best_fit_cells,
+    find_best_template_indices,
+    get_cell_views,
+    get_cropped_cell_coordinates,
+    get_template_bank,
+    get_template_sources,
+    get_templates_directory,
+    imread,
+    imwrite,
+)
+
+CORPUS_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+MANIFEST_FILENAME = "manifest.json"
+FRAME_SHAPE = (615, 1040, 3)
+SYNTHETIC_VARIANTS = {
+    "Minesweeper Variants": ["V", "W", "N"],
+    "Minesweeper Variants 2": ["V"],
+}
+SIZES = [5, 6, 7, 8]
+## --stress 일 때 픽셀마다 더하는 노이즈의 최대 크기, 판 전체를 미는 최대 픽셀 수
+STRESS_NOISE = 24
+STRESS_MAX_OFFSET = 1
+
+
+def load_corpus_frames(corpus_directory=CORPUS_DIRECTORY) -> list[dict]:
+    manifest_path = os.path.join(corpus_directory, MANIFEST_FILENAME)
+    if not os.path.exists(manifest_path):
+        return []
+    with open(manifest_path, encoding="utf-8") as f:
+        entries = json.load(f)
+    frames = []
+    for entry in entries:
+        frame = imread(os.path.join(corpus_directory, entry["image"]))
+        frames.append(
+            {
+                "name": os.path.basename(entry["image"]),
+                "frame": frame,
+                "window_title": entry["window_title"],
+                "rule": entry["rule"],
+                "size": entry["size"],
+                "grid": entry["grid"],
+                "source": "real",
+            }
+        )
+    return frames
+
+
+def get_synthetic_background(frames) -> np.ndarray:
+    """실제 캡쳐 중 창 크기가 맞는 첫 장. 없으면 검은 배경"""
+    for entry in frames:
+        if entry["frame"] is not None and entry["frame"].shape == FRAME_SHAPE:
+            return entry["frame"]
+    return np.zeros(FRAME_SHAPE, dtype=np.uint8)
+
+
+def make_synthetic_frame(
+    window_title,
+    rule,
+    size,
+    rng,
+    background,
+    noise=0,
+    max_offset=0,
+) -> dict:
+    """
+    background 위에 임의의 템플릿들을 붙입니다. 기본값이면 템플릿 그대로이고,
+    max_offset 을 주면 판 전체를 (dx, dy) 만큼 밀어서 붙이고 noise 를 주면 노이즈를 더합니다.
+    인식은 원래 셀 좌표로 하므로 밀면 가장자리에 배경과 옆 칸이 섞여 들어갑니다.
+    """
+    bank = get_template_bank(get_templates_directory(window_title, rule), size)
+    frame = background.astype(np.int16)
+    dx, dy = rng.integers(-max_offset, max_offset + 1, size=2)
+    labels = []
+    for row_coordinates in get_cropped_cell_coordinates(window_title, size):
+        row_labels = []
+        for x1, y1, x2, y2 in row_coordinates:
+            index = rng.integers(len(bank))
+            frame[y1 + dy : y2 + dy, x1 + dx : x2 + dx] = bank.templates[index]
+            row_labels.append(bank.labels[index])
+        labels.append(row_labels)
+    if noise:
+        frame += rng.integers(-noise, noise + 1, size=frame.shape, dtype=np.int16)
+    return {
+        "name": f"synthetic {window_title} {rule} {size}x{size} offset ({dx}, {dy})",
+        "frame": np.clip(frame, 0, 255).astype(np.uint8),
+        "window_title": window_title,
+        "rule": rule,
+        "size": size,
+        "grid": labels,
+        "source": "synthetic",
+    }
+
+
+def make_synthetic_frames(background, seed=0, noise=0, max_offset=0) -> list[dict]:
+    rng = np.random.default_rng(seed)
+    return [
+        make_synthetic_frame(
+            window_title, rule, size, rng, background, noise, max_offset
+        )
+        for window_title, rules in SYNTHETIC_VARIANTS.items()
+        for rule in rules
+        for size in SIZES
+    ]
+
+
+def record_corpus_frame(
+    window_title, rule, size, name, corpus_directory=CORPUS_DIRECTORY
+):
+    """
+    실제 게임 창을 캡쳐해서 corpus 에 추가합니다.
+    grid 는 현재 인식 결과로 채워지므로 저장 후 manifest 를 직접 확인해야 합니다.
+    """
+    frame = capture_window_screenshot(window_title)
+    grid = convert_to_numeric(find_best_fit_cells(window_title, size, rule, frame))
+    image_filename = f"{name}.png"
+    imwrite(os.path.join(corpus_directory, image_filename), frame)
+
+    manifest_path = os.path.join(corpus_directory, MANIFEST_FILENAME)
+    entries = []
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            entries = json.load(f)
+    entries.append(
+        {
+            "image": image_filename,
+            "window_title": window_title,
+            "rule": rule,
+            "size": size,
+            "grid": grid,
+        }
+    )
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(entries, f, ensure_ascii=False, indent=2)
+    return grid
+
+
+def count_misclassified_cells(grid, expected_grid) -> int:
+    return sum(
+        actual != expected
+        for actual_row, expected_row in zip(grid, expected_grid)
+        for actual, expected in zip(actual_row, expected_row)
+    )
+
+
+def benchmark_recognition(frames, repeat=10, warm=False, recognize=None) -> dict:
+    """
+    recognize(window_title, size, rule, frame, cache) -> best_fit_cells 를 돌려서
+    프레임당 지연시간, 셀 처리량, 오인식 수를 잽니다. 정확도는 source (real/synthetic) 별로 셉니다.
+    warm 이 아니면 매번 빈 캐시로 시작해서 템플릿 비교 비용을 그대로 잽니다.
+    """
+    if recognize is None:
+        recognize = find_best_fit_cells
+    cache = CellRecognitionCache()
+    latencies = []
+    total_cells = 0
+    misclassified = 0
+    misclassified_frames = []
+    accuracy = {}
+    for entry in frames:
+        for _ in range(repeat):
+            if not warm:
+                cache = CellRecognitionCache()
+            start = time.perf_counter()
+            best_fit_cells = recognize(
+                entry["window_title"],
+                entry["size"],
+                entry["rule"],
+                entry["frame"],
+                cache,
+            )
+            latencies.append(time.perf_counter() - start)
+            total_cells += entry["size"] ** 2
+        errors = count_misclassified_cells(
+            convert_to_numeric(best_fit_cells), entry["grid"]
+        )
+        source = accuracy.setdefault(entry["source"], {"cells": 0, "misclassified": 0})
+        source["cells"] += entry["size"] ** 2
+        source["misclassified"] += errors
+        if errors:
+            misclassified += errors
+            misclassified_frames.append(entry["name"])
+
+    latencies_ms = np.array(latencies) * 1000
+    p50, p90, p99 = np.percentile(latencies_ms, [50, 90, 99])
+    return {
+        "frames": len(frames),
+        "calls": len(latencies),
+        "p50_ms": p50,
+        "p90_ms": p90,
+        "p99_ms": p99,
+        "max_ms": latencies_ms.max(),
+        "cells_per_second": total_cells / sum(latencies),
+        "misclassified_cells": misclassified,
+        "misclassified_frames": misclassified_frames,
+        "accuracy": accuracy,
+    }
+
+
+def benchmark_matcher(frames, repeat=10, top_k=None) -> dict:
+    """캐시 없이 find_best_template_indices 만 돌려서 전체 비교와 fingerprint 가지치기를 비교합니다"""
+    latencies = []
+    results = []
+    for entry in frames:
+        bank = get_template_bank(
+            get_templates_directory(entry["window_title"], entry["rule"]),
+            entry["size"],
+        )
+        cells = get_cell_views(entry["frame"], entry["window_title"], entry["size"])
+        for _ in range(repeat):
+            start = time.perf_counter()
+            best_indices, _ = find_best_template_indices(cells, bank, top_k=top_k)
+            latencies.append(time.perf_counter() - start)
+        results.append(best_indices)
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "mean_ms": float(latencies_ms.mean()),
+        "best_indices": results,
+    }
+
+
+def benchmark_template_loading(repeat=10) -> dict:
+    """템플릿 폴더들을 PNG 로 읽을 때와 아틀라스로 열 때를 비교합니다"""
+    templates_directories = sorted(
+        {
+            get_templates_directory(window_title, rule)
+            for window_title, rules in SYNTHETIC_VARIANTS.items()
+            for rule in rules
+        }
+    )
+    for templates_directory in templates_directories:
+        TemplateBank.load(templates_directory)  ## 아틀라스가 없으면 여기서 만듭니다
+
+    def measure(load):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for templates_directory in templates_directories:
+                load(templates_directory)
+        return (time.perf_counter() - start) / repeat * 1000
+
+    return {
+        "png_ms": measure(
+            lambda directory: TemplateBank.load_pngs(
+                directory, list(get_template_sources(directory))
+            )
+        ),
+        "atlas_ms": measure(TemplateBank.load),
+    }
+
+
+def print_report(title, result):
+    print(f"[{title}] {result['frames']} frames, {result['calls']} calls")
+    print(
+        f"  latency p50 {result['p50_ms']:.2f} ms / p90 {result['p90_ms']:.2f} ms"
+        f" / p99 {result['p99_ms']:.2f} ms / max {result['max_ms']:.2f} ms"
+    )
+    print(f"  throughput {result['cells_per_second']:.0f} cells/s")
+    print(f"  misclassified cells {result['misclassified_cells']}")
+    for source, counts in result["accuracy"].items():
+        correct = counts["cells"] - counts["misclassified"]
+        print(
+            f"    {source:9s} accuracy {correct / counts['cells']:.2%}"
+            f" ({counts['misclassified']} / {counts['cells']} cells wrong)"
+        )
+    for name in result["misclassified_frames"]:
+        print(f"    - {name}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-synthetic", action="store_true")
+    parser.add_argument(
+        "--stress",
+        action="store_true",
+        help="합성 스크린샷을 밀고 노이즈를 더합니다 (정확도가 떨어지는 게 정상)",
+    )
+    parser.add_argument("--noise", type=int, default=None)
+    parser.add_argument("--max-offset", type=int, default=None)
+    parser.add_argument(
+        "--record",
+        nargs=4,
+        metavar=("WINDOW_TITLE", "RULE", "SIZE", "NAME"),
+        help="게임 창을 캡쳐해서 corpus 에 추가합니다",
+    )
+    args = parser.parse_args(argv)
+    if args.noise is None:
+        args.noise = STRESS_NOISE if args.stress else 0
+    if args.max_offset is None:
+        args.max_offset = STRESS_MAX_OFFSET if args.stress else 0
+
+    if args.record:
+        window_title, rule, size, name = args.record
+        grid = record_corpus_frame(window_title, rule, int(size), name)
+        for row in grid:
+            print(" ".join(str(cell).rjust(3) for cell in row))
+        return None
+
+    frames = load_corpus_frames()
+    if not args.no_synthetic:
+        frames.extend(
+            make_synthetic_frames(
+                get_synthetic_background(frames),
+                args.seed,
+                args.noise,
+                args.max_offset,
+            )
+        )
+
+    results = {}
+    loading = benchmark_template_loading(args.repeat)
+    print(
+        f"[template loading] png decode {loading['png_ms']:.2f} ms"
+        f" / atlas {loading['atlas_ms']:.2f} ms"
+    )
+    results["template loading"] = loading
+    for title, warm in [("cold cache", False), ("warm cache", True)]:
+        results[title] = benchmark_recognition(frames, args.repeat, warm)
+        print_report(title, results[title])
+
+    board_8x8 = [entry for entry in frames if entry["size"] == 8]
+    if not board_8x8:
+        ## 실제 캡쳐만 쓰면 큰 판이 없을 수 있음
+        return results
+    exhaustive = benchmark_matcher(board_8x8, args.repeat, top_k=None)
+    pruned = benchmark_matcher(board_8x8, args.repeat, top_k=FINGERPRINT_TOP_K)
+    identical = all(
+        np.array_equal(a, b)
+        for a, b in zip(exhaustive["best_indices"], pruned["best_indices"])
+    )
+    print(f"[8x8 matcher] {len(board_8x8)} frames")
+    print(
+        f"  exhaustive p50 {exhaustive['p50_ms']:.2f} ms"
+        f" / fingerprint pruned p50 {pruned['p50_ms']:.2f} ms"
+        f" ({exhaustive['mean_ms'] / pruned['mean_ms']:.1f}x), identical: {identical}"
+    )
+    results["8x8 matcher"] = {"exhaustive": exhaustive, "pruned": pruned}
+    return results
+
+
+if __name__ == "__main__":
+    main()
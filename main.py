@@ -10,6 +10,8 @@ def main():
         "window_title": "Minesweeper Variants",
         "rule": "BK",
         "iterate_forever": False,
+        "debug_dump": False,
+        "capture_thread": False,
     }
     app = QApplication(sys.argv)
     main_window = window.MyWindow(conf)
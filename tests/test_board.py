@@ -0,0 +1,75 @@
+from window.board import Board, case_to_mask
+from window.const import RULE_Q, RULE_D2, get_rule_B
+from window.rules import filter_cases_by_rule, is_valid_case_for_rule
+from window.region import ExpandedRegion
+from window.utils import apply_hints, get_grid_region, get_rule_regions
+
+GRID = [
+    [-1, 1, -2, -1, 0],
+    [2, -1, -1, 3, -3],
+    [-2, -1, 1, -1, -1],
+    [-1, -1, -1, 2, -2],
+    [0, -1, -1, -1, -1],
+]
+
+
+def test_board_round_trip_and_masks():
+    board = Board.from_grid(GRID)
+    assert board.to_grid() == GRID
+    assert board.blank | board.mine | board.number == board.full
+    assert not board.blank & board.mine
+    assert board.mask_to_cells(board.mine) == [(0, 2), (2, 0), (3, 4)]
+
+    hints = {("safe", (0, 0)), ("mine", (1, 1))}
+    assert board.masks_to_hints(*board.hints_to_masks(hints)) == hints
+    assert board.apply_hints(hints).to_grid() == apply_hints(
+        [row[:] for row in GRID], hints
+    )
+
+
+def test_board_regions_match_grid_regions():
+    board = Board.from_grid(GRID)
+    for rule in ["V", "X", "K", "B"]:
+        assert [
+            (region.mines_needed, region.blank_cells)
+            for region in get_rule_regions(board, rule)
+        ] == [
+            (region.mines_needed, region.blank_cells)
+            for region in get_rule_regions(GRID, rule)
+        ]
+    assert get_grid_region(board, "V").mines_needed == 10 - 3
+
+
+def test_rule_checks_on_applied_boards():
+    board = Board.from_grid([[-1, -1, 1], [-1, -1, 1], [1, 1, 1]])
+    assert not is_valid_case_for_rule(board.apply(0, board.blank), RULE_Q)
+    assert is_valid_case_for_rule(board.apply(board.bit(0, 0), 0), RULE_Q)
+
+    cross = Board.from_grid([[1, -1, 1], [-1, -2, -1], [1, -1, 1]])
+    assert not is_valid_case_for_rule(cross.apply(0, cross.blank), RULE_D2)
+    top_mine = cross.bit(0, 1)
+    assert is_valid_case_for_rule(
+        cross.apply(top_mine, cross.blank & ~top_mine), RULE_D2
+    )
+
+    region = ExpandedRegion(blank_cells=[(0, 0), (0, 1)], cases=[0, 1, 2, 3])
+    top = Board.from_grid([[-1, -1], [1, 1]])
+    assert filter_cases_by_rule(region, top, RULE_Q).cases.tolist() == [1, 2, 3]
+    assert filter_cases_by_rule(
+        region, [[-1] * 5] * 5, get_rule_B(5)
+    ).cases.tolist() == [
+        0,
+        1,
+        2,
+        3,
+    ]
+
+
+def test_case_tables_map_case_bits_to_board_bits():
+    board = Board.from_grid([[-1] * 5 for _ in range(5)])
+    cells = sorted(board.mask_to_cells(board.blank), reverse=True)[:19]
+    tables = board.get_case_tables(cells)
+    assert [len(table) for table in tables] == [256, 256, 8]
+    for case in [0, 1, 0b101, 0x7FFFF, 0x5A5A5]:
+        mines = [cell for index, cell in enumerate(cells) if case >> index & 1]
+        assert case_to_mask(case, tables) == board.cells_to_mask(mines)
@@ -0,0 +1,189 @@
+import numpy as np
+
+from window import capture, image_utils, utils
+
+
+def test_snapshot_captures_once_until_invalidated(monkeypatch):
+    frames = []
+
+    def fake_capture(window_title, dump_path=None):
+        frames.append(np.full((4, 4, 3), len(frames), dtype=np.uint8))
+        return frames[-1]
+
+    monkeypatch.setattr(capture, "capture_window_screenshot", fake_capture)
+    snapshot = capture.Snapshot("Minesweeper Variants")
+
+    first = snapshot.frame
+    assert snapshot.frame is first
+    assert snapshot.capture_count == 1
+
+    snapshot.invalidate()
+    assert snapshot.frame is not first
+    assert snapshot.capture_count == 2
+
+
+def test_window_geometry_redetects_size_only_when_probes_change():
+    geometry = capture.WindowGeometry("Minesweeper Variants")
+    frame = image_utils.imread("size_skipper.png")
+    assert geometry.board_size(frame) == 5
+
+    frame = frame.copy()
+    frame[300:400, 500:600] = 0
+    assert geometry.board_size(frame) == 5
+    assert geometry.detections == 1
+
+    x, y = image_utils.INITIAL_POSITIONS[7]
+    frame[y, x] = 255
+    assert geometry.board_size(frame) == 7
+    assert geometry.detections == 2
+
+
+def test_window_geometry_follows_moved_window(monkeypatch):
+    class FakeWindow:
+        left, top, width, height = 10, 20, 960, 640
+
+    rects = []
+
+    def fake_capture(window_title, dump_path, target_window, rect, activate):
+        rects.append(rect)
+        return np.zeros((4, 4, 3), dtype=np.uint8)
+
+    monkeypatch.setattr(capture, "capture_window_screenshot", fake_capture)
+    geometry = capture.WindowGeometry("Minesweeper Variants")
+    geometry._window = FakeWindow()
+    geometry.capture()
+    assert geometry.rect == (10, 20, 960, 640)
+
+    FakeWindow.left, FakeWindow.top = 300, 40
+    geometry.capture()
+    assert rects == [(10, 20, 960, 640), (300, 40, 960, 640)]
+    assert geometry.refresh_rect()[:2] == (300, 40)
+
+    geometry._window = None
+    monkeypatch.setattr(capture.WindowGeometry, "window", property(lambda self: 1 / 0))
+    assert geometry.capture() is None
+
+
+def test_capture_thread_ring_buffer_counts_and_stability():
+    values = iter([0, 1, 1, 2, 3, 3, 3])
+    capture_thread = capture.CaptureThread(
+        lambda: np.full((4, 4, 3), next(values), dtype=np.uint8), capacity=3
+    )
+    for _ in range(3):
+        capture_thread.capture_once()
+    assert capture_thread.latest_stable().sequence == 2
+    assert [record.changed for record in capture_thread.frames] == [True, True, False]
+
+    after = capture_thread.frames[-1].captured_at + 1e-9
+    for _ in range(4):
+        capture_thread.capture_once()
+    assert len(capture_thread.frames) == 3
+    assert capture_thread.dropped == 1
+    assert capture_thread.latest().frame[0, 0, 0] == 3
+    assert capture_thread.latest_stable(after).sequence == 6
+
+
+def test_snapshot_waits_for_frame_after_invalidate():
+    frames = [np.full((4, 4, 3), value, dtype=np.uint8) for value in range(3)]
+    source_calls = []
+
+    def fake_source():
+        source_calls.append(None)
+        return frames[min(len(source_calls) // 4, 2)]
+
+    with capture.CaptureThread(fake_source, interval=0.001) as capture_thread:
+        snapshot = capture.Snapshot(
+            "Minesweeper Variants", capture_thread=capture_thread
+        )
+        assert snapshot.frame is not None
+        snapshot.invalidate()
+        invalidated_at = snapshot._invalidated_at
+        frame = snapshot.frame
+        assert any(
+            record.captured_at >= invalidated_at and record.frame is frame
+            for record in capture_thread.frames
+        )
+        assert capture_thread.fps > 0
+    assert capture_thread.failed == 0
+
+
+def test_replay_and_synthetic_backends():
+    frames = [np.full((4, 4, 3), value, dtype=np.uint8) for value in range(2)]
+    replay = capture.ReplayCapture(frames, loop=False)
+    assert [replay.capture() is frame for frame in frames] == [True, True]
+    assert replay.capture() is None
+
+    grid = [[1, 2, -1, -2, 0]] * 5
+    synthetic = capture.SyntheticCapture("Minesweeper Variants", "V", [grid])
+    frame = synthetic.capture()
+    best_fit_cells = image_utils.GridRecognizer().recognize(
+        "Minesweeper Variants", 5, "V", frame
+    )
+    assert image_utils.convert_to_numeric(best_fit_cells) == grid
+    assert synthetic.capture() is frame
+
+
+def test_snapshot_probe_shares_frame_unless_polling():
+    frame = image_utils.imread("size_skipper.png")
+    backend = capture.ReplayCapture([frame])
+    snapshot = capture.Snapshot("Minesweeper Variants", backend=backend)
+
+    assert snapshot.probe(image_utils.all_solved_probe_table, poll=True)
+    assert snapshot.capture_count == 0
+    assert backend.served == 1
+
+    assert snapshot.probe(image_utils.all_solved_probe_table)
+    assert snapshot.probe(image_utils.status_probe_table) == (
+        image_utils.completed_check(frame)
+    )
+    assert snapshot.frame is frame
+    assert snapshot.capture_count == 1
+    assert backend.served == 2
+
+    assert snapshot.probe(image_utils.all_solved_probe_table, poll=True)
+    assert backend.served == 2
+
+
+def test_solve_iteration_recognizes_and_stops_on_shared_frame():
+    reference = image_utils.imread("size_skipper.png")
+    background = reference.copy()
+    for table in [image_utils.all_solved_probe_table, image_utils.status_probe_table]:
+        for x1, y1, x2, y2 in table.get_regions():
+            background[y1:y2, x1:x2] = 64
+    grid = [[-1, 1, -1, -1, -1]] + [[-1] * 5 for _ in range(4)]
+    backend = capture.SyntheticCapture(
+        "Minesweeper Variants", "V", [grid], background=background
+    )
+    snapshot = capture.Snapshot("Minesweeper Variants", backend=backend)
+    statuses = []
+
+    def check_status(window_title, snapshot):
+        statuses.append(snapshot.probe(image_utils.status_probe_table))
+        return statuses[-1]
+
+    marks = []
+    result = utils.solve_iteration(
+        "Minesweeper Variants",
+        "V",
+        snapshot,
+        capture.WindowGeometry("Minesweeper Variants"),
+        image_utils.GridRecognizer(cache=image_utils.CellRecognitionCache()),
+        check_status,
+        marks,
+    )
+    assert not result.all_solved
+    assert statuses == [image_utils.PuzzleStatus.INCOMPLETE]
+    assert result.size == 5
+    assert result.grid == grid
+    assert result.hints == utils.find_hints(grid, "V")
+    assert len(marks) == len(utils.ITERATION_STAGES)
+    assert snapshot.capture_count == 1
+
+    snapshot = capture.Snapshot(
+        "Minesweeper Variants", backend=capture.ReplayCapture([reference])
+    )
+    result = utils.solve_iteration(
+        "Minesweeper Variants", "V", snapshot, None, None, check_status
+    )
+    assert result.all_solved and result.frame is None
+    assert len(statuses) == 1
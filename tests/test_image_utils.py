@@ -0,0 +1,243 @@
+import numpy as np
+import pytest
+
+from window import image_utils
+
+
+def make_screenshot(window_title, size, bank, indices):
+    screenshot = np.zeros((615, 1040, 3), dtype=np.uint8)
+    cell_coordinates = image_utils.get_cropped_cell_coordinates(window_title, size)
+    for row_coordinates, row_indices in zip(cell_coordinates, indices):
+        for (x1, y1, x2, y2), index in zip(row_coordinates, row_indices):
+            screenshot[y1:y2, x1:x2] = bank.templates[index]
+    return screenshot
+
+
+@pytest.mark.parametrize(
+    "window_title, rule, size",
+    [
+        ("Minesweeper Variants", "V", 8),
+        ("Minesweeper Variants", "W", 5),
+        ("Minesweeper Variants 2", "V", 7),
+    ],
+)
+def test_template_bank_matches_every_cell(window_title, rule, size):
+    bank = image_utils.get_template_bank(
+        image_utils.get_templates_directory(window_title, rule)
+    )
+    rng = np.random.default_rng(size)
+    indices = rng.integers(len(bank), size=(size, size))
+    screenshot = make_screenshot(window_title, size, bank, indices)
+
+    cells = image_utils.get_cell_views(screenshot, window_title, size)
+    assert np.shares_memory(cells, screenshot)
+    best_indices, min_measures = image_utils.find_best_template_indices(cells, bank)
+
+    expected = [[bank.filenames[i] for i in row] for row in indices]
+    actual = [[bank.filenames[i] for i in row] for row in best_indices]
+    assert image_utils.convert_to_numeric(actual) == image_utils.convert_to_numeric(
+        expected
+    )
+    assert (min_measures == 0).all()
+
+
+def test_recognition_cache_skips_matching_for_seen_cells():
+    window_title, rule, size = "Minesweeper Variants", "V", 6
+    bank = image_utils.get_template_bank(
+        image_utils.get_templates_directory(window_title, rule)
+    )
+    indices = np.random.default_rng(0).integers(len(bank), size=(size, size))
+    screenshot = make_screenshot(window_title, size, bank, indices)
+    cache = image_utils.CellRecognitionCache(max_entries=8)
+
+    first = image_utils.find_best_fit_cells(
+        window_title, size, rule, screenshot, cache=cache
+    )
+    assert cache.misses > 8
+    assert len(cache) == 8
+
+    cache = image_utils.CellRecognitionCache()
+    image_utils.find_best_fit_cells(window_title, size, rule, screenshot, cache=cache)
+    second = image_utils.find_best_fit_cells(
+        window_title, size, rule, screenshot, cache=cache
+    )
+    assert second == first
+    assert cache.misses == len(cache)
+    assert cache.hits >= size * size
+
+
+def test_grid_recognizer_rematches_only_changed_cells():
+    window_title, rule, size = "Minesweeper Variants", "V", 5
+    bank = image_utils.get_template_bank(
+        image_utils.get_templates_directory(window_title, rule)
+    )
+    indices = np.random.default_rng(1).integers(len(bank), size=(size, size))
+    recognizer = image_utils.GridRecognizer(cache=image_utils.CellRecognitionCache())
+
+    first = recognizer.recognize(
+        window_title, size, rule, make_screenshot(window_title, size, bank, indices)
+    )
+    assert len(recognizer.changed_cells) == size * size
+
+    indices[2, 3] = (indices[2, 3] + 1) % len(bank)
+    second = recognizer.recognize(
+        window_title, size, rule, make_screenshot(window_title, size, bank, indices)
+    )
+    assert recognizer.changed_cells == {(2, 3)}
+    assert second[2][3] == bank.filenames[indices[2, 3]]
+    assert [row[:3] + row[4:] for row in second] == [row[:3] + row[4:] for row in first]
+
+
+def test_find_templates_in_screenshot():
+    bank = image_utils.get_template_bank(
+        image_utils.get_templates_directory("Minesweeper Variants", "V")
+    )
+    flag = bank.templates[bank.filenames.index("cell_flag.png")]
+    star = bank.templates[bank.filenames.index("cell_star.png")]
+    screenshot = np.zeros((300, 400, 3), dtype=np.uint8)
+    screenshot[120:170, 210:260] = flag
+    noisy = star.astype(np.int16) + np.random.default_rng(2).integers(
+        -3, 4, size=star.shape
+    )
+    screenshot[20:70, 30:80] = np.clip(noisy, 0, 255).astype(np.uint8)
+
+    assert image_utils.find_templates_in_screenshot(screenshot, [flag, star]) == [
+        (210, 120),
+        None,
+    ]
+    assert image_utils.find_templates_in_screenshot(
+        screenshot, [star], max_mean_sqdiff=10
+    ) == [(30, 20)]
+    assert image_utils.find_templates_in_screenshot(
+        screenshot, [flag], regions=[(0, 0, 200, 300)]
+    ) == [None]
+
+
+def test_template_index_offers_only_size_specific_templates():
+    templates_directory = image_utils.get_templates_directory(
+        "Minesweeper Variants 2", "V"
+    )
+    size6 = image_utils.get_template_bank(templates_directory, 6).filenames
+    size7 = image_utils.get_template_bank(templates_directory, 7).filenames
+
+    assert all(filename.endswith("_s6.png") for filename in size6)
+    assert "cell_8_s6.png" in size6
+    assert not any("_s6" in filename for filename in size7)
+    assert "cell_blank.png" in size7
+
+
+def test_fingerprint_pruning_matches_exhaustive_search():
+    window_title, rule, size = "Minesweeper Variants", "V", 8
+    bank = image_utils.get_template_bank(
+        image_utils.get_templates_directory(window_title, rule), size
+    )
+    rng = np.random.default_rng(3)
+    indices = rng.integers(len(bank), size=(size, size))
+    screenshot = make_screenshot(window_title, size, bank, indices)
+    noise = rng.integers(-60, 61, size=screenshot.shape)
+    noisy = np.clip(screenshot + noise, 0, 255).astype(np.uint8)
+
+    for frame in [screenshot, noisy]:
+        cells = image_utils.get_cell_views(frame, window_title, size)
+        exhaustive = image_utils.find_best_template_indices(cells, bank, top_k=None)
+        pruned = image_utils.find_best_template_indices(cells, bank)
+        assert np.array_equal(exhaustive[0], pruned[0])
+        assert np.array_equal(exhaustive[1], pruned[1])
+
+
+def test_status_probe_table_follows_check_order():
+    frame = np.zeros((615, 1040, 3), dtype=np.uint8)
+    assert image_utils.completed_check(frame) == image_utils.PuzzleStatus.STAR_BROKEN
+
+    frame[580, 41] = 255
+    assert image_utils.completed_check(frame) == image_utils.PuzzleStatus.INCOMPLETE
+
+    frame[70, 863] = image_utils.RED
+    assert image_utils.completed_check(frame) == image_utils.PuzzleStatus.ALREADY_SOLVED
+
+    frame[51, 833] = image_utils.YELLOW
+    frame[65, 868] = image_utils.YELLOW
+    frames = np.stack([frame, np.full_like(frame, 255)])
+    assert image_utils.status_probe_table.match_stack(frames) == [
+        image_utils.PuzzleStatus.FINISH,
+        image_utils.PuzzleStatus.INCOMPLETE,
+    ]
+    assert (
+        image_utils.completed_check(frame[:100]) == image_utils.PuzzleStatus.INCOMPLETE
+    )
+
+
+def test_all_solved_probe_compares_reference_patch():
+    reference = image_utils.imread("size_skipper.png")
+    assert image_utils.all_solved_check("Minesweeper Variants", reference)
+    frame = reference.copy()
+    frame[580, 1000] += 1
+    assert not image_utils.all_solved_check("Minesweeper Variants", frame)
+
+
+def test_probe_table_matches_from_cropped_regions():
+    reference = image_utils.imread("size_skipper.png")
+    rng = np.random.default_rng(5)
+    palette = np.array(
+        [image_utils.YELLOW, image_utils.DARK_RED, image_utils.RED, (0, 0, 0)],
+        dtype=np.uint8,
+    )
+    for table in [image_utils.status_probe_table, image_utils.all_solved_probe_table]:
+        for _ in range(50):
+            frame = reference.copy()
+            for x1, y1, x2, y2 in table.get_regions():
+                if x2 - x1 == 1:
+                    frame[y1, x1] = palette[rng.integers(len(palette))]
+            patches = [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in table.get_regions()]
+            assert table.match_regions(patches) == table.match(frame)
+    assert image_utils.status_probe_table.match_regions([]) == (
+        image_utils.PuzzleStatus.INCOMPLETE
+    )
+
+
+def test_template_atlas_is_memory_mapped_and_rebuilt_on_change(tmp_path):
+    source_directory = image_utils.get_templates_directory("Minesweeper Variants", "V")
+    for filename in ["cell_1.png", "cell_2.png", "cell_flag.png"]:
+        image_utils.imwrite(
+            str(tmp_path / filename),
+            image_utils.imread(f"{source_directory}/{filename}"),
+        )
+
+    built = image_utils.TemplateBank.load(str(tmp_path))
+    assert (tmp_path / image_utils.ATLAS_FILENAME).exists()
+    loaded = image_utils.TemplateBank.load(str(tmp_path))
+    assert isinstance(loaded.templates, np.memmap)
+    assert isinstance(loaded.packed, np.memmap)
+    assert np.array_equal(loaded.packed, built.packed)
+    assert loaded.filenames == built.filenames
+    assert loaded.labels == [1, 2, -2]
+    assert np.array_equal(loaded.templates, built.templates)
+    assert np.array_equal(loaded.fingerprints, built.fingerprints)
+
+    image_utils.imwrite(str(tmp_path / "cell_2.png"), built.templates[0])
+    reloaded = image_utils.TemplateBank.load(str(tmp_path))
+    assert np.array_equal(reloaded.templates[1], built.templates[0])
+
+
+def test_corrupt_template_atlas_is_rebuilt(tmp_path):
+    source_directory = image_utils.get_templates_directory("Minesweeper Variants", "V")
+    for filename in ["cell_1.png", "cell_flag.png"]:
+        image_utils.imwrite(
+            str(tmp_path / filename),
+            image_utils.imread(f"{source_directory}/{filename}"),
+        )
+    atlas_path = tmp_path / image_utils.ATLAS_FILENAME
+    assert image_utils.build_template_atlases(str(tmp_path)) == [str(atlas_path)]
+    data = atlas_path.read_bytes()
+
+    header_start = len(image_utils.ATLAS_MAGIC) + 4
+    for corrupt in [
+        data[: header_start + 10],
+        data[:-100],
+        data[:header_start] + b"}" + data[header_start + 1 :],
+    ]:
+        atlas_path.write_bytes(corrupt)
+        assert image_utils.read_template_atlas(str(atlas_path)) is None
+        bank = image_utils.TemplateBank.load(str(tmp_path))
+        assert bank.labels == [1, -2]
+        assert image_utils.read_template_atlas(str(atlas_path)) is not None
@@ -0,0 +1,48 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from window.region import ExpandedRegion, Region
+
+
+def test_expanded_region_stores_sorted_unique_cases():
+    region = ExpandedRegion([(0, 0), (0, 1), (1, 1)], [5, 1, 5, 3, 1])
+    assert region.cases.dtype == np.uint64
+    assert region.cases.tolist() == [1, 3, 5]
+    assert region.case_count == 3
+    assert not region.cases.flags.writeable
+    assert dict(region.get_case(2)) == {(0, 0): True, (0, 1): False, (1, 1): True}
+
+    large = ExpandedRegion([(0, c) for c in range(8)], range(1 << 16))
+    assert large.cases.nbytes == 8 * (1 << 16)
+
+
+def test_expanded_region_equality_uses_digest():
+    region = ExpandedRegion([(0, 0), (0, 1)], [2, 1])
+    same = ExpandedRegion.from_sorted_cases(
+        [(0, 1), (0, 0)], np.array([1, 2], dtype=np.uint64)
+    )
+    assert region == same
+    assert hash(region) == hash(same)
+    assert region.digest == same.digest
+    assert region != ExpandedRegion([(0, 0), (0, 1)], [1, 3])
+    assert region != ExpandedRegion([(0, 0), (0, 2)], [1, 2])
+    assert region in [ExpandedRegion([(1, 1)], [0]), same]
+
+
+def test_region_is_immutable_and_keeps_the_model_api():
+    region = Region(mines_needed=1, blank_cells={(0, 0), (0, 1), (1, 0)})
+    assert isinstance(region.blank_cells, frozenset)
+    assert region.total_blanks == 3
+    assert region.numbers_needed == 2
+    with pytest.raises(AttributeError):
+        region.mines_needed = 2
+
+    part = Region(mines_needed=1, blank_cells=[(0, 0)])
+    rest = region - part
+    assert rest.mines_needed == 0
+    assert rest.blank_cells == {(0, 1), (1, 0)}
+    assert rest == Region(mines_needed=5, blank_cells={(1, 0), (0, 1)})
+    assert len({region, part, rest, Region(mines_needed=0, blank_cells=[(0, 0)])}) == 3
+    assert pickle.loads(pickle.dumps(region)) == region
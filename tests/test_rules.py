@@ -0,0 +1,134 @@
+import random
+
+import pytest
+
+from window.board import Board
+from window.const import (
+    RULE_A,
+    RULE_D1,
+    RULE_D2,
+    RULE_H,
+    RULE_Q,
+    RULE_T,
+    RULE_U,
+    get_rule_B,
+)
+from window.region import ExpandedRegion
+from window.rules import (
+    PatternCondition,
+    compile_rule,
+    filter_cases_by_rule,
+    is_valid_case_for_rule,
+    localize_rule,
+    split_rule,
+)
+
+
+def scan_windows(grid, rule):
+    """창을 하나씩 훑는 예전 방식 그대로의 검사"""
+    height, width = len(grid), len(grid[0])
+    condition = rule["pattern_condition"]
+    for row in range(height):
+        for col in range(width):
+            for direction in rule["directions"]:
+                cells = []
+                for dr, dc in direction:
+                    if not (0 <= row + dr < height and 0 <= col + dc < width):
+                        break
+                    cells.append(grid[row + dr][col + dc])
+                else:
+                    mines, blanks = cells.count(-2), cells.count(-1)
+                    numbers = len(cells) - mines - blanks
+                    if condition == "no_all_mines" and mines == len(cells):
+                        return False
+                    if condition == "no_all_numbers" and numbers == len(cells):
+                        return False
+                    if condition == "max_two_mines" and mines > 2:
+                        return False
+                    if condition == "exact_two_mines" and (
+                        mines > 2 or mines + blanks < 2
+                    ):
+                        return False
+                    if condition == "exact_three_mines" and (
+                        mines > 3 or mines + blanks < 3
+                    ):
+                        return False
+                    if condition == "cross_D" and cells[0] == -2:
+                        if all(cell not in [-1, -2] for cell in cells[1:]):
+                            return False
+                        if cells[1:].count(-2) >= 2:
+                            return False
+    return True
+
+
+@pytest.mark.parametrize("size", [5, 6, 7, 8])
+def test_compiled_rules_match_window_scan(size):
+    rng = random.Random(size)
+    rules = [RULE_Q, RULE_T, RULE_A, RULE_H, RULE_U, RULE_D1, RULE_D2, get_rule_B(size)]
+    for _ in range(300):
+        weights = [rng.random() for _ in range(3)]
+        grid = [rng.choices([-1, -2, 1], weights=weights, k=size) for _ in range(size)]
+        board = Board.from_grid(grid)
+        for rule in rules:
+            assert is_valid_case_for_rule(board, rule) == scan_windows(grid, rule)
+
+
+def test_compile_rule_is_cached_per_board_size():
+    compiled = compile_rule(RULE_T, 6, 6)
+    assert compile_rule(RULE_T, 6, 6) is compiled
+    assert compile_rule(RULE_T, 7, 7) is not compiled
+    assert compiled.condition == PatternCondition.NO_ALL_MINES
+    ## 가로 4*6, 세로 6*4, 대각선 4*4 두개
+    assert len(compiled.windows) == 24 + 24 + 16 + 16
+
+    cross = compile_rule(RULE_D2, 5, 5)
+    assert len(cross.windows) == 3 * 3
+    assert all(window & center for window, center in zip(cross.windows, cross.centers))
+
+
+def test_split_rule_checks_only_windows_touching_region():
+    rng = random.Random(7)
+    for rule in [RULE_T, RULE_Q, RULE_D2, get_rule_B(6)]:
+        compiled = compile_rule(rule, 6, 6)
+        for _ in range(100):
+            grid = [rng.choices([-1, -2, 1], k=6) for _ in range(6)]
+            board = Board.from_grid(grid)
+            region_mask = board.blank & rng.getrandbits(36)
+            inside, outside = split_rule(compiled, region_mask)
+            assert len(inside.windows) + len(outside.windows) == len(compiled.windows)
+            assert all(window & region_mask for window in inside.windows)
+            assert not any(window & region_mask for window in outside.windows)
+
+            local = localize_rule(compiled, board, region_mask)
+            for _ in range(10):
+                mine_mask = region_mask & rng.getrandbits(36)
+                applied = board.apply(mine_mask, region_mask & ~mine_mask)
+                expected = compiled.is_valid(applied.mine, applied.number)
+                if local is None:
+                    assert not expected
+                else:
+                    assert local.is_valid(applied.mine, applied.number) == expected
+
+
+@pytest.mark.parametrize("size", [5, 8])
+def test_case_array_filter_matches_per_case_check(size):
+    rng = random.Random(size + 10)
+    rules = [RULE_Q, RULE_T, RULE_A, RULE_H, RULE_U, RULE_D1, RULE_D2, get_rule_B(size)]
+    for _ in range(60):
+        grid = [
+            rng.choices([-1, -2, 1], weights=[4, 1, 3], k=size) for _ in range(size)
+        ]
+        board = Board.from_grid(grid)
+        blanks = board.mask_to_cells(board.blank)
+        blank_cells = sorted(rng.sample(blanks, min(6, len(blanks))))
+        case_count = 1 << len(blank_cells)
+        region = ExpandedRegion(blank_cells=blank_cells, cases=list(range(case_count)))
+        cell_bits = [board.bit(*cell) for cell in blank_cells]
+        for rule in rules:
+            expected = []
+            for case in range(case_count):
+                mine_mask = sum(bit for i, bit in enumerate(cell_bits) if case >> i & 1)
+                applied = board.apply(mine_mask, sum(cell_bits) & ~mine_mask)
+                if is_valid_case_for_rule(applied, rule):
+                    expected.append(case)
+            assert filter_cases_by_rule(region, board, rule).cases.tolist() == expected
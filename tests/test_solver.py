@@ -0,0 +1,103 @@
+import random
+
+import numpy as np
+
+from window.region import ExpandedRegion
+from window.utils import (
+    apply_hints_to_exregion,
+    compact_case_bits,
+    extract_hints,
+    merge_expanded_regions,
+)
+
+
+def random_region(rng, cell_count, case_count):
+    cells = sorted(rng.sample([(r, c) for r in range(8) for c in range(8)], cell_count))
+    cases = rng.sample(range(1 << cell_count), min(case_count, 1 << cell_count))
+    return ExpandedRegion(blank_cells=cells, cases=cases)
+
+
+def test_extract_hints_finds_fixed_cells_and_projects_the_rest():
+    rng = random.Random(0)
+    for _ in range(200):
+        region = random_region(rng, rng.randint(1, 12), rng.randint(1, 40))
+        fixed_mine = rng.getrandbits(len(region.blank_cells))
+        fixed_safe = rng.getrandbits(len(region.blank_cells)) & ~fixed_mine
+        region = ExpandedRegion(
+            blank_cells=region.blank_cells,
+            cases=[(case | fixed_mine) & ~fixed_safe for case in region.cases.tolist()],
+        )
+        hints, reduced = extract_hints(region)
+
+        uncertain = []
+        for i, cell in enumerate(region.blank_cells):
+            bits = {case >> i & 1 for case in region.cases.tolist()}
+            if bits == {1}:
+                assert ("mine", cell) in hints
+            elif bits == {0}:
+                assert ("safe", cell) in hints
+            else:
+                uncertain.append(i)
+        if not hints:
+            assert reduced is region
+        elif not uncertain:
+            assert reduced is None
+        else:
+            expected = {
+                sum((case >> old & 1) << new for new, old in enumerate(uncertain))
+                for case in region.cases.tolist()
+            }
+            assert reduced.blank_cells == [region.blank_cells[i] for i in uncertain]
+            assert reduced.cases.tolist() == sorted(expected)
+
+
+def test_compact_case_bits_moves_runs_of_bits():
+    cases = np.array([0b1011_0110, 0b0100_1001, 0xFF], dtype=np.uint64)
+    compacted = compact_case_bits(cases, [0, 2, 3, 6, 7])
+    assert compacted.tolist() == [0b10010, 0b01101, 0b11111]
+
+
+def test_apply_hints_to_exregion_keeps_matching_cases():
+    region = ExpandedRegion(blank_cells=[(0, 0), (0, 1), (1, 0)], cases=list(range(8)))
+    hints = {("mine", (0, 0)), ("safe", (1, 0)), ("safe", (5, 5))}
+    assert apply_hints_to_exregion(region, hints).cases.tolist() == [1, 3]
+    assert apply_hints_to_exregion(region, {("mine", (1, 0)), ("safe", (1, 0))}) is None
+
+
+def merge_by_pairs(r1, r2):
+    """예전처럼 case 쌍을 하나씩 맞춰 보는 merge"""
+    all_cells = sorted(set(r1.blank_cells) | set(r2.blank_cells))
+    merged = []
+    for case1 in r1.cases.tolist():
+        for case2 in r2.cases.tolist():
+            mines1 = {c for i, c in enumerate(r1.blank_cells) if case1 >> i & 1}
+            mines2 = {c for i, c in enumerate(r2.blank_cells) if case2 >> i & 1}
+            shared = set(r1.blank_cells) & set(r2.blank_cells)
+            if mines1 & shared == mines2 & shared:
+                merged.append(
+                    sum(1 << i for i, c in enumerate(all_cells) if c in mines1 | mines2)
+                )
+    return all_cells, sorted(merged)
+
+
+def test_merge_expanded_regions_joins_on_shared_cells():
+    rng = random.Random(1)
+    for _ in range(200):
+        r1 = random_region(rng, rng.randint(1, 9), rng.randint(1, 30))
+        if rng.random() < 0.3:
+            cells = sorted(
+                rng.sample(r1.blank_cells, rng.randint(1, len(r1.blank_cells)))
+            )
+            r2 = ExpandedRegion(
+                blank_cells=cells, cases=rng.sample(range(1 << len(cells)), 1)
+            )
+        else:
+            r2 = random_region(rng, rng.randint(1, 9), rng.randint(1, 30))
+        for left, right in [(r1, r2), (r2, r1)]:
+            all_cells, expected = merge_by_pairs(left, right)
+            merged = merge_expanded_regions(left, right)
+            if not expected:
+                assert merged is None
+            else:
+                assert merged.blank_cells == all_cells
+                assert merged.cases.tolist() == expected
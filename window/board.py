@@ -0,0 +1,178 @@
+from functools import lru_cache
+
+from window.const import SPECIAL_CELLS
+
+
+class Board:
+    """
+    최대 8x8 판을 비트마스크로 들고 있는 것. 셀 (r, c) 는 r * width + c 번째 비트.
+    blank / mine / number 마스크는 서로 겹치지 않고 합치면 판 전체가 됩니다.
+    clues 는 숫자칸의 값이고, 빈칸 자리에는 숫자로 칠해졌을 때의 값(star)을 넣어둬서
+    apply() 로 만든 판끼리 그대로 공유합니다.
+    """
+
+    __slots__ = ("height", "width", "blank", "mine", "number", "clues")
+
+    def __init__(self, height, width, blank, mine, number, clues):
+        self.height = height
+        self.width = width
+        self.blank = blank
+        self.mine = mine
+        self.number = number
+        self.clues = clues
+
+    @classmethod
+    def from_grid(cls, grid: list[list[int]]) -> "Board":
+        height, width = len(grid), len(grid[0])
+        blank = mine = number = 0
+        clues = []
+        for index, value in enumerate(cell for row in grid for cell in row):
+            bit = 1 << index
+            if value == SPECIAL_CELLS["blank"]:
+                blank |= bit
+                clues.append(SPECIAL_CELLS["star"])
+            elif value == SPECIAL_CELLS["flag"]:
+                mine |= bit
+                clues.append(SPECIAL_CELLS["flag"])
+            else:
+                number |= bit
+                clues.append(value)
+        return cls(height, width, blank, mine, number, tuple(clues))
+
+    def to_grid(self) -> list[list[int]]:
+        grid = []
+        for row in range(self.height):
+            grid_row = []
+            for col in range(self.width):
+                grid_row.append(self.value(row, col))
+            grid.append(grid_row)
+        return grid
+
+    def __len__(self) -> int:
+        return self.height
+
+    @property
+    def full(self) -> int:
+        return (1 << (self.height * self.width)) - 1
+
+    def bit(self, row, col) -> int:
+        return 1 << (row * self.width + col)
+
+    def value(self, row, col) -> int:
+        bit = self.bit(row, col)
+        if self.blank & bit:
+            return SPECIAL_CELLS["blank"]
+        if self.mine & bit:
+            return SPECIAL_CELLS["flag"]
+        return self.clues[row * self.width + col]
+
+    def cells_to_mask(self, cells) -> int:
+        mask = 0
+        for row, col in cells:
+            mask |= 1 << (row * self.width + col)
+        return mask
+
+    def mask_to_cells(self, mask) -> list[tuple[int, int]]:
+        cells = []
+        while mask:
+            low = mask & -mask
+            cells.append(divmod(low.bit_length() - 1, self.width))
+            mask ^= low
+        return cells
+
+    def get_case_tables(self, cells) -> tuple[tuple[int, ...], ...]:
+        """
+        case 의 i 번째 비트가 cells[i] 일 때, case 의 바이트마다 (0~255 -> 판 마스크) 표.
+        case_to_mask 로 판을 새로 만들지 않고 case 를 지뢰 마스크로 바꿉니다.
+        """
+        cell_bits = [self.bit(row, col) for row, col in cells]
+        tables = []
+        for start in range(0, len(cell_bits), 8):
+            table = [0]
+            for bit in cell_bits[start : start + 8]:
+                table += [mask | bit for mask in table]
+            tables.append(tuple(table))
+        return tuple(tables)
+
+    def apply(self, mine_mask, safe_mask) -> "Board":
+        """mine_mask 는 지뢰로, safe_mask 는 숫자로 채운 판. clues 는 그대로 공유합니다"""
+        return Board(
+            self.height,
+            self.width,
+            self.blank & ~(mine_mask | safe_mask),
+            (self.mine & ~safe_mask) | mine_mask,
+            (self.number & ~mine_mask) | safe_mask,
+            self.clues,
+        )
+
+    def hints_to_masks(self, hints) -> tuple[int, int]:
+        """힌트 set 을 (safe_mask, mine_mask) 로 바꿉니다"""
+        safe_mask = mine_mask = 0
+        for hint_type, (row, col) in hints:
+            if hint_type == "safe":
+                safe_mask |= self.bit(row, col)
+            elif hint_type == "mine":
+                mine_mask |= self.bit(row, col)
+        return safe_mask, mine_mask
+
+    def masks_to_hints(self, safe_mask, mine_mask) -> set[tuple[str, tuple[int, int]]]:
+        return {("safe", cell) for cell in self.mask_to_cells(safe_mask)} | {
+            ("mine", cell) for cell in self.mask_to_cells(mine_mask)
+        }
+
+    def apply_hints(self, hints) -> "Board":
+        """utils.apply_hints 와 같이 safe 는 숫자(star), mine 은 지뢰로 표시합니다"""
+        safe_mask, mine_mask = self.hints_to_masks(hints)
+        safe_mask &= ~mine_mask
+        board = self.apply(mine_mask, safe_mask)
+        board.clues = tuple(
+            SPECIAL_CELLS["star"] if safe_mask >> index & 1 else clue
+            for index, clue in enumerate(self.clues)
+        )
+        return board
+
+
+def case_to_mask(case, tables) -> int:
+    mask = 0
+    for table in tables:
+        mask |= table[case & 0xFF]
+        case >>= 8
+    return mask
+
+
+def as_board(grid) -> Board:
+    if isinstance(grid, Board):
+        return grid
+    return Board.from_grid(grid)
+
+
+def as_grid(board) -> list[list[int]]:
+    if isinstance(board, Board):
+        return board.to_grid()
+    return board
+
+
+@lru_cache(maxsize=None)
+def get_offset_masks(height, width, offsets) -> tuple[int, ...]:
+    """셀마다 offsets 만큼 떨어진 (판 안의) 셀들의 마스크"""
+    masks = []
+    for row in range(height):
+        for col in range(width):
+            mask = 0
+            for dr, dc in offsets:
+                r, c = row + dr, col + dc
+                if 0 <= r < height and 0 <= c < width:
+                    mask |= 1 << (r * width + c)
+            masks.append(mask)
+    return tuple(masks)
+
+
+@lru_cache(maxsize=None)
+def get_line_masks(height, width) -> tuple[tuple[int, ...], tuple[int, ...]]:
+    """(행 마스크들, 열 마스크들)"""
+    row_mask = (1 << width) - 1
+    rows = tuple(row_mask << (row * width) for row in range(height))
+    cols = tuple(
+        sum(1 << (row * width + col) for row in range(height)) for col in range(width)
+    )
+    return rows, cols
@@ -0,0 +1,33 @@
+"""
+images 아래 템플릿 폴더마다 아틀라스(templates.atlas)를 미리 만듭니다.
+
+    python -m window.build_atlases
+
+아틀라스가 PNG 들과 맞으면 그대로 두고, 없거나 오래됐거나 깨졌으면 다시 만듭니다.
+실행 중에도 처음 불러올 때 같은 방식으로 만들어지지만, 템플릿을 추가하거나 바꾼 뒤
+미리 돌려 두면 첫 인식이 PNG 를 디코딩하느라 느려지지 않습니다.
+"""
+
+import argparse
+
+from window.image_utils import build_template_atlases, get_images_directory
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "images_directory",
+        nargs="?",
+        default=get_images_directory(),
+        help="템플릿 폴더들이 있는 images 폴더 (기본: 저장소의 images)",
+    )
+    args = parser.parse_args(argv)
+
+    atlas_paths = build_template_atlases(args.images_directory)
+    for atlas_path in atlas_paths:
+        print(atlas_path)
+    return atlas_paths
+
+
+if __name__ == "__main__":
+    main()
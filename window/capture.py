@@ -0,0 +1,429 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import NamedTuple
+
+import numpy as np
+
+from window.image_utils import (
+    capture_window_regions,
+    capture_window_screenshot,
+    dump_frame_async,
+    detect_cell_size,
+    get_cropped_cell_coordinates,
+    get_size_probe_points,
+    get_template_bank,
+    get_templates_directory,
+    imread,
+)
+
+FRAME_SHAPE = (615, 1040, 3)
+
+## 캡쳐 백엔드는 capture(dump_path=None, activate=True) -> BGR 프레임 | None 과
+## capture_regions(regions) -> 영역별 BGR 배열 리스트 | None 을 가집니다.
+## WindowGeometry 가 실제 게임 창을 찍는 백엔드이고, 게임 없이 돌릴 때는
+## ReplayCapture / SyntheticCapture 를 씁니다.
+
+
+class WindowGeometry:
+    """
+    창 핸들, 창 위치/크기, 판 크기를 기억해 두는 것. 실제 창을 찍는 캡쳐 백엔드이기도 합니다.
+    판 크기는 이미 찍은 프레임에서 크기 판별용 점들만 보고
+    그 색이 바뀌었을 때만 다시 판별합니다.
+    """
+
+    def __init__(self, window_title):
+        self.window_title = window_title
+        self.probe_points = get_size_probe_points(window_title)
+        self._window = None
+        self._rect = None
+        self._frame_shape = None
+        self._size_signature = None
+        self._board_size = None
+        self.lookups = 0
+        self.detections = 0
+
+    @property
+    def window(self):
+        if self._window is None:
+            import pygetwindow as gw
+
+            self._window = gw.getWindowsWithTitle(self.window_title)[0]
+            self.lookups += 1
+        return self._window
+
+    @property
+    def rect(self) -> tuple[int, int, int, int]:
+        """(left, top, width, height)"""
+        if self._rect is None:
+            window = self.window
+            self._rect = (window.left, window.top, window.width, window.height)
+        return self._rect
+
+    def refresh_rect(self) -> tuple[int, int, int, int]:
+        """
+        캐시된 창 핸들에서 위치와 크기를 다시 읽습니다. 창을 옮긴 뒤 예전 자리를 찍거나
+        클릭하지 않도록 캡쳐, 클릭 전마다 부릅니다. 핸들은 다시 찾지 않아서 쌉니다.
+        """
+        window = self.window
+        self._rect = (window.left, window.top, window.width, window.height)
+        return self._rect
+
+    def get_size_signature(self, frame: np.ndarray) -> bytes:
+        return b"".join(frame[y, x].tobytes() for x, y in self.probe_points.values())
+
+    def board_size(self, frame: np.ndarray) -> int:
+        """
+        frame 에서 판 크기를 구합니다. 크기 판별용 점들이 지난번과 같으면
+        캐시된 값을 그대로 씁니다.
+        """
+        if frame.shape != self._frame_shape:
+            self._rect = None
+            self._frame_shape = frame.shape
+            self._size_signature = None
+        signature = self.get_size_signature(frame)
+        if signature != self._size_signature:
+            self.detections += 1
+            try:
+                self._board_size = detect_cell_size(self.window_title, frame)
+            except ValueError:
+                ## 팝업 등으로 판이 가려진 경우 이전 크기를 그대로 씁니다
+                if self._board_size is None:
+                    raise
+                return self._board_size
+            self._size_signature = signature
+        return self._board_size
+
+    def get_current_rect(self) -> tuple[int, int, int, int] | None:
+        try:
+            return self.refresh_rect()
+        except Exception as e:
+            print(f"Error reading window rect: {e}")
+            self.invalidate()
+            return None
+
+    def capture(self, dump_path=None, activate=True) -> np.ndarray | None:
+        rect = self.get_current_rect()
+        if rect is None:
+            return None
+        frame = capture_window_screenshot(
+            self.window_title, dump_path, self.window, rect, activate
+        )
+        if frame is None:
+            self.invalidate()
+        return frame
+
+    def capture_regions(self, regions, activate=False) -> list[np.ndarray] | None:
+        rect = self.get_current_rect()
+        if rect is None:
+            return None
+        patches = capture_window_regions(
+            self.window_title, regions, self.window, rect, activate
+        )
+        if patches is None:
+            self.invalidate()
+        return patches
+
+    def invalidate(self):
+        """창이 닫히거나 옮겨졌을 때 다시 찾도록 합니다"""
+        self._window = None
+        self._rect = None
+        self._frame_shape = None
+        self._size_signature = None
+        self._board_size = None
+
+
+_window_geometries = {}
+
+
+def get_window_geometry(window_title) -> WindowGeometry:
+    if window_title not in _window_geometries:
+        _window_geometries[window_title] = WindowGeometry(window_title)
+    return _window_geometries[window_title]
+
+
+class ReplayCapture:
+    """
+    저장된 프레임을 순서대로 돌려주는 캡쳐 백엔드.
+    fps 를 주면 실제 캡쳐처럼 그 속도보다 빨리 돌려주지 않습니다.
+    loop 가 False 면 다 돌려준 뒤 None 을 반환합니다.
+    """
+
+    def __init__(self, frames, fps=None, loop=True):
+        self.frames = list(frames)
+        self.fps = fps
+        self.loop = loop
+        self.served = 0
+        self._started_at = None
+
+    @classmethod
+    def from_directory(cls, directory, fps=None, loop=True):
+        filenames = sorted(f for f in os.listdir(directory) if f.endswith(".png"))
+        return cls(
+            [imread(os.path.join(directory, filename)) for filename in filenames],
+            fps,
+            loop,
+        )
+
+    def capture(self, dump_path=None, activate=True) -> np.ndarray | None:
+        if not self.frames or (not self.loop and self.served >= len(self.frames)):
+            return None
+        if self.fps:
+            now = time.monotonic()
+            if self._started_at is None:
+                self._started_at = now
+            wait = self._started_at + self.served / self.fps - now
+            if wait > 0:
+                time.sleep(wait)
+        frame = self.frames[self.served % len(self.frames)]
+        self.served += 1
+        if dump_path:
+            dump_frame_async(frame, dump_path)
+        return frame
+
+    def capture_regions(self, regions, activate=False) -> list[np.ndarray] | None:
+        frame = self.capture()
+        if frame is None:
+            return None
+        return [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in regions]
+
+
+def get_value_templates(bank) -> dict[int, np.ndarray]:
+    """숫자값 -> 그 값으로 인식되는 템플릿. 같은 값이면 파일명이 가장 짧은 것을 씁니다"""
+    value_templates = {}
+    for filename, template, value in sorted(
+        zip(bank.filenames, bank.templates, bank.labels),
+        key=lambda item: len(item[0]),
+    ):
+        value_templates.setdefault(value, template)
+    return value_templates
+
+
+def render_grid_frame(window_title, rule, grid, background=None) -> np.ndarray:
+    """숫자 grid 를 템플릿으로 그려서 게임 창 캡쳐처럼 만듭니다"""
+    size = len(grid)
+    bank = get_template_bank(get_templates_directory(window_title, rule), size)
+    value_templates = get_value_templates(bank)
+    if background is None:
+        frame = np.zeros(FRAME_SHAPE, dtype=np.uint8)
+    else:
+        frame = background.copy()
+    for row_coordinates, row in zip(
+        get_cropped_cell_coordinates(window_title, size), grid
+    ):
+        for (x1, y1, x2, y2), value in zip(row_coordinates, row):
+            if value not in value_templates:
+                raise ValueError(f"no template for cell value {value}")
+            frame[y1:y2, x1:x2] = value_templates[value]
+    return frame
+
+
+class SyntheticCapture(ReplayCapture):
+    """숫자 grid 들을 템플릿으로 그린 프레임을 돌려주는 캡쳐 백엔드"""
+
+    def __init__(self, window_title, rule, grids, background=None, fps=None, loop=True):
+        super().__init__(
+            [render_grid_frame(window_title, rule, grid, background) for grid in grids],
+            fps,
+            loop,
+        )
+
+
+class CapturedFrame(NamedTuple):
+    frame: np.ndarray
+    captured_at: float  ## time.monotonic()
+    sequence: int
+    changed: bool  ## 바로 앞 프레임과 다른지
+
+
+## CaptureThread 가 한 장 찍고 쉬는 시간(초). 0 이면 쉬지 않고 창 전체를 계속 찍음
+CAPTURE_INTERVAL = 1 / 30
+
+
+class CaptureThread:
+    """
+    source() 를 계속 불러서 최근 capacity 개의 프레임을 링 버퍼에 쌓는 생산자 스레드.
+    소비자는 기다리지 않고 latest()/latest_stable() 로 최신 프레임을 가져가고,
+    클릭 직후처럼 그 이후의 화면이 필요할 때만 wait_for_stable() 로 기다립니다.
+    소비자가 그 프레임이나 더 새 프레임을 읽기 전에 밀려난 것은 dropped 로 셉니다.
+    """
+
+    def __init__(self, source, capacity=8, interval=CAPTURE_INTERVAL):
+        self.source = source
+        self.interval = interval
+        self.frames = deque(maxlen=capacity)
+        self.captured = 0
+        self.failed = 0
+        self.dropped = 0
+        self._timestamps = deque(maxlen=32)
+        self._last_read_sequence = -1
+        self._condition = threading.Condition()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @property
+    def fps(self) -> float:
+        with self._condition:
+            if len(self._timestamps) < 2:
+                return 0.0
+            span = self._timestamps[-1] - self._timestamps[0]
+            return (len(self._timestamps) - 1) / span if span > 0 else 0.0
+
+    def capture_once(self) -> CapturedFrame | None:
+        try:
+            frame = self.source()
+        except Exception as e:
+            print(f"Error capturing frame: {e}")
+            frame = None
+        captured_at = time.monotonic()
+        with self._condition:
+            if frame is None:
+                self.failed += 1
+                return None
+            previous = self.frames[-1] if self.frames else None
+            changed = previous is None or not np.array_equal(previous.frame, frame)
+            if len(self.frames) == self.frames.maxlen:
+                if self.frames[0].sequence > self._last_read_sequence:
+                    self.dropped += 1
+            record = CapturedFrame(frame, captured_at, self.captured, changed)
+            self.frames.append(record)
+            self.captured += 1
+            self._timestamps.append(captured_at)
+            self._condition.notify_all()
+            return record
+
+    def _mark_read(self, record):
+        if record is not None:
+            self._last_read_sequence = max(self._last_read_sequence, record.sequence)
+        return record
+
+    def _find_stable(self, after):
+        ## 같은 내용이 after 이후에 두 번 연속 찍혔으면 화면이 멈춘 것으로 봅니다
+        records = list(self.frames)
+        for previous, record in zip(records[-2::-1], records[::-1]):
+            if previous.captured_at < after:
+                break
+            if not record.changed:
+                return record
+        return None
+
+    def latest(self) -> CapturedFrame | None:
+        with self._condition:
+            return self._mark_read(self.frames[-1] if self.frames else None)
+
+    def latest_stable(self, after=float("-inf")) -> CapturedFrame | None:
+        with self._condition:
+            return self._mark_read(self._find_stable(after))
+
+    def wait_for_stable(self, after=float("-inf"), timeout=1.0) -> CapturedFrame | None:
+        """
+        after 이후에 찍힌 안정된 프레임을 기다립니다.
+        timeout 안에 화면이 멈추지 않으면 after 이후의 최신 프레임을 반환합니다.
+        """
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                record = self._find_stable(after)
+                remaining = deadline - time.monotonic()
+                if record is not None or remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            if record is None and self.frames and self.frames[-1].captured_at >= after:
+                record = self.frames[-1]
+            return self._mark_read(record)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self.capture_once()
+            self._stop_event.wait(self.interval)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class Snapshot:
+    """
+    한 번 찍은 창 캡쳐를 화면이 바뀔 때까지 같이 쓰기 위한 것.
+    클릭을 한 쪽에서 invalidate() 를 부르면 다음 frame 접근 때 다시 캡쳐합니다.
+    backend 를 주면 그 캡쳐 백엔드로 찍고, capture_thread 를 주면 직접 찍지 않고
+    마지막 invalidate() 이후의 안정된 프레임을 가져옵니다.
+    """
+
+    def __init__(
+        self,
+        window_title,
+        dump_path=None,
+        backend=None,
+        capture_thread=None,
+        stable_timeout=1.0,
+    ):
+        self.window_title = window_title
+        self.dump_path = dump_path
+        self.backend = backend
+        self.capture_thread = capture_thread
+        self.stable_timeout = stable_timeout
+        self.captured_at = None
+        self.capture_count = 0
+        self._frame = None
+        self._invalidated_at = float("-inf")
+
+    @property
+    def frame(self) -> np.ndarray | None:
+        if self._frame is None:
+            if self.capture_thread is not None:
+                record = self.capture_thread.wait_for_stable(
+                    self._invalidated_at, self.stable_timeout
+                )
+                self._frame = record.frame if record is not None else None
+                if self.dump_path and self._frame is not None:
+                    dump_frame_async(self._frame, self.dump_path)
+            elif self.backend is not None:
+                self._frame = self.backend.capture(self.dump_path)
+            else:
+                self._frame = capture_window_screenshot(
+                    self.window_title, self.dump_path
+                )
+            self.captured_at = time.time()
+            self.capture_count += 1
+        return self._frame
+
+    def probe(self, probe_table, poll=False):
+        """
+        probe_table 의 결과를 구합니다. 보통은 인식에도 쓸 frame 을 같이 씁니다.
+        poll=True 이면 (화면이 바뀌기만 기다리는 경우) 아직 찍은 프레임이 없을 때
+        창 전체 대신 probe_table 의 영역만 잘라 찍습니다.
+        """
+        if (
+            poll
+            and self._frame is None
+            and self.capture_thread is None
+            and hasattr(self.backend, "capture_regions")
+        ):
+            patches = self.backend.capture_regions(probe_table.get_regions())
+            if patches is None:
+                return probe_table.default
+            return probe_table.match_regions(patches)
+        if self.frame is None:
+            return probe_table.default
+        return probe_table.match(self.frame)
+
+    def invalidate(self):
+        self._frame = None
+        self._invalidated_at = time.monotonic()
@@ -24,12 +24,14 @@ NEIGHBORS = {
 
 
 RULE_Q = {
+    "name": "Q",
     "directions": [[(0, 0), (0, 1), (1, 0), (1, 1)]],
     "pattern_condition": "no_all_numbers",
     "outsider_condition": "invalid",
 }
 
 RULE_T = {
+    "name": "T",
     "directions": [
         [(0, 0), (0, 1), (0, 2)],
         [(0, 0), (1, 0), (2, 0)],
@@ -41,6 +43,7 @@ RULE_T = {
 }
 
 RULE_A = {
+    "name": "A",
     "directions": [
         [(0, 0), (1, 2)],
         [(1, 0), (0, 2)],
@@ -52,12 +55,14 @@ RULE_A = {
 }
 
 RULE_H = {
+    "name": "H",
     "directions": [[(0, 0), (0, 1)]],
     "pattern_condition": "no_all_mines",
     "outsider_condition": "invalid",
 }
 
 RULE_U = {
+    "name": "U",
     "directions": [[(0, 0), (0, 1)], [(0, 0), (1, 0)]],
     "pattern_condition": "no_all_mines",
     "outsider_condition": "invalid",
@@ -65,12 +70,14 @@ RULE_U = {
 
 
 RULE_D1 = {
+    "name": "D1",
     "directions": [[(0, 0), (0, 1), (1, 0), (1, 1)]],
     "pattern_condition": "max_two_mines",
     "outsider_condition": "number",
 }
 
 RULE_D2 = {
+    "name": "D2",
     "directions": [[(0, 0), (0, -1), (0, 1), (-1, 0), (1, 0)]],
     "pattern_condition": "cross_D",
     "outsider_condition": "number",
@@ -1,10 +1,14 @@
+import hashlib
+import json
 import os
+import re
 import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
 
 import cv2
 import numpy as np
-import pygetwindow as gw
 from PIL import Image, ImageGrab
 
 from window.const import INITIAL_POSITIONS, INITIAL_POSITIONS_2, SPECIAL_CELLS
@@ -36,59 +40,187 @@ def imwrite(filename, img, params=None):
         return False
 
 
-def capture_window_screenshot(window_title):
+_dump_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="frame_dump")
+
+
+def dump_frame_async(frame, filename):
+    """디버그용으로 프레임을 백그라운드에서 파일로 저장합니다"""
+    return _dump_executor.submit(imwrite, filename, frame)
+
+
+def capture_window_screenshot(
+    window_title, dump_path=None, target_window=None, rect=None, activate=True
+) -> np.ndarray | None:
+    """
+    창을 캡쳐해서 imread 와 같은 BGR 배열로 반환합니다.
+    dump_path 를 주면 디버그용으로 비동기 저장합니다.
+    target_window, rect (left, top, width, height) 를 주면 창을 다시 찾지 않습니다.
+    activate 가 False 면 창을 앞으로 가져오지 않고 바로 찍습니다.
+    """
     try:
-        target_window = gw.getWindowsWithTitle(window_title)[0]
-        target_window.activate()
-        time.sleep(0.03)
-        x, y, width, height = (
-            target_window.left,
-            target_window.top,
-            target_window.width,
-            target_window.height,
-        )
+        if target_window is None:
+            import pygetwindow as gw  ## 윈도우 전용이라 벤치마크/테스트는 이것 없이 돌아가게 함
+
+            target_window = gw.getWindowsWithTitle(window_title)[0]
+        if activate:
+            target_window.activate()
+            time.sleep(0.03)
+        if rect is None:
+            rect = (
+                target_window.left,
+                target_window.top,
+                target_window.width,
+                target_window.height,
+            )
+        x, y, width, height = rect
         screenshot = ImageGrab.grab(bbox=(x, y, x + width, y + height))
-        screenshot.save(f"{window_title}.png")
-        return True
+        frame = cv2.cvtColor(np.asarray(screenshot), cv2.COLOR_RGB2BGR)
+        if dump_path:
+            dump_frame_async(frame, dump_path)
+        return frame
     except Exception as e:
         print(f"Error capturing screenshot: {e}")
-        return False
+        return None
+
+
+def capture_window_regions(
+    window_title, regions, target_window=None, rect=None, activate=False
+) -> list[np.ndarray] | None:
+    """
+    창 안의 (x1, y1, x2, y2) 영역들만 잘라서 BGR 배열 리스트로 반환합니다.
+    Pillow 의 ImageGrab 은 윈도우에서 bbox 와 상관없이 화면 전체를 찍은 뒤 잘라내므로
+    영역이 몇 개든 한 번만 찍습니다. 아끼는 것은 창 전체를 변환하고 복사하는 비용뿐이라
+    인식할 프레임이 어차피 필요할 때는 그 프레임을 쓰는 편이 낫습니다.
+    """
+    try:
+        if target_window is None:
+            import pygetwindow as gw
+
+            target_window = gw.getWindowsWithTitle(window_title)[0]
+        if activate:
+            target_window.activate()
+            time.sleep(0.03)
+        if rect is None:
+            rect = (target_window.left, target_window.top)
+        x, y = rect[:2]
+        left = min(x1 for x1, _, _, _ in regions)
+        top = min(y1 for _, y1, _, _ in regions)
+        right = max(x2 for _, _, x2, _ in regions)
+        bottom = max(y2 for _, _, _, y2 in regions)
+        screenshot = ImageGrab.grab(bbox=(x + left, y + top, x + right, y + bottom))
+        return [
+            cv2.cvtColor(
+                np.asarray(screenshot.crop((x1 - left, y1 - top, x2 - left, y2 - top))),
+                cv2.COLOR_RGB2BGR,
+            )
+            for x1, y1, x2, y2 in regions
+        ]
+    except Exception as e:
+        print(f"Error capturing regions: {e}")
+        return None
 
 
-def detect_cell_size(window_title):
-    capture_window_screenshot(window_title)
-    screenshot = imread(f"{window_title}.png")
+def get_size_probe_points(window_title) -> dict[int, tuple[int, int]]:
+    """detect_cell_size 가 보는 (x, y) 좌표를 크기별로 반환합니다"""
+    if window_title == "Minesweeper Variants":
+        return dict(INITIAL_POSITIONS)
+    elif window_title == "Minesweeper Variants 2":
+        return {size: (x - 1, y - 1) for size, (x, y) in INITIAL_POSITIONS_2.items()}
+    return {}
+
+
+def detect_cell_size(window_title, screenshot=None):
+    if screenshot is None:
+        screenshot = capture_window_screenshot(window_title)
     gray = (128, 128, 128)
     white = (255, 255, 255)
+    probe_points = get_size_probe_points(window_title)
     for size in [8, 7, 6, 5]:
+        if size not in probe_points:
+            continue
+        x, y = probe_points[size]
+        color = screenshot[y, x]
         if window_title == "Minesweeper Variants":
-            x, y = INITIAL_POSITIONS[size]
-            color = screenshot[y, x]
             if (color == white).all():
                 return size
         elif window_title == "Minesweeper Variants 2":
-            x, y = INITIAL_POSITIONS_2[size]
-            color = screenshot[y - 1, x - 1]
             if (color > gray).all():
                 return size
     raise ValueError("cell_size not found")
 
 
+def _as_image(image) -> np.ndarray:
+    if isinstance(image, str):
+        return imread(image)
+    return image
+
+
+def _locate_template(screenshot, template, region, max_mean_sqdiff):
+    x1, y1, x2, y2 = region
+    search_area = screenshot[y1:y2, x1:x2]
+    template_height, template_width = template.shape[:2]
+    if search_area.shape[0] < template_height or search_area.shape[1] < template_width:
+        return None, None
+    result = cv2.matchTemplate(search_area, template, cv2.TM_SQDIFF)
+    min_value = float(result.min())
+    if max_mean_sqdiff > 0:
+        mean_sqdiff = max(min_value, 0.0) / template.size
+        if mean_sqdiff > max_mean_sqdiff:
+            return None, None
+        y, x = np.unravel_index(np.argmin(result), result.shape)
+        return (x1 + int(x), y1 + int(y)), mean_sqdiff
+
+    ## float32 로 계산하기 때문에 0 근처의 후보만 추려서 실제 픽셀로 확인합니다
+    tolerance = max(1.0, 1e-5 * float(np.square(template, dtype=np.float64).sum()))
+    candidates = np.argwhere(result <= min_value + tolerance)
+    for y, x in sorted(candidates.tolist(), key=lambda yx: (yx[1], yx[0])):
+        if np.array_equal(
+            search_area[y : y + template_height, x : x + template_width], template
+        ):
+            return (x1 + x, y1 + y), 0.0
+    return None, None
+
+
+def find_templates_in_screenshot(
+    screenshot, templates, regions=None, max_mean_sqdiff=0.0
+) -> list[tuple[int, int] | None]:
+    """
+    여러 템플릿의 위치를 cv2.matchTemplate 로 한번에 찾습니다.
+
+    Args:
+        screenshot: BGR 배열 또는 이미지 경로
+        templates: BGR 배열 또는 이미지 경로의 리스트
+        regions: 찾을 영역 (x1, y1, x2, y2) 리스트. None 이면 화면 전체
+        max_mean_sqdiff: 0 이면 완전히 같은 위치만, 아니면 픽셀당 평균 제곱오차가
+            이 값 이하인 가장 비슷한 위치를 찾습니다
+
+    Returns:
+        템플릿마다 왼쪽 위 좌표 (x, y), 못 찾으면 None
+    """
+    screenshot = _as_image(screenshot)
+    if regions is None:
+        regions = [(0, 0, screenshot.shape[1], screenshot.shape[0])]
+    locations = []
+    for template in templates:
+        template = _as_image(template)
+        best_location, best_measure = None, None
+        for region in regions:
+            location, measure = _locate_template(
+                screenshot, template, region, max_mean_sqdiff
+            )
+            if location is not None and (
+                best_measure is None or measure < best_measure
+            ):
+                best_location, best_measure = location, measure
+                if measure == 0:
+                    break
+        locations.append(best_location)
+    return locations
+
+
 def find_template_in_screenshot(screenshot_path, template_path):
     try:
-        screenshot = Image.open(screenshot_path)
-        template = Image.open(template_path)
-        screenshot_width, screenshot_height = screenshot.size
-        template_width, template_height = template.size
-        for x in range(screenshot_width - template_width + 1):
-            for y in range(screenshot_height - template_height + 1):
-                screenshot_region = screenshot.crop(
-                    (x, y, x + template_width, y + template_height)
-                )
-                if screenshot_region == template:
-                    return x, y
-        return None
-
+        return find_templates_in_screenshot(screenshot_path, [template_path])[0]
     except Exception as e:
         print(f"Error while searching for template: {e}")
         return None
@@ -139,67 +271,550 @@ def count_different_pixels(image_path_1, image_path_2):
     return np.count_nonzero(diff_mask)
 
 
-def find_best_template_filename(window_title, captured_cell_path, templates_directory):
-    best_template_filename = None
-    min_measure = float("inf")
-    for template_filename in os.listdir(templates_directory):
-        template_path = os.path.join(templates_directory, template_filename)
-        diff_pixels = count_different_pixels(captured_cell_path, template_path)
-        if diff_pixels < min_measure:
-            min_measure = diff_pixels
-            best_template_filename = template_filename
-            if diff_pixels == 0:
-                break
-        # mse = MSE_of_images(captured_cell_path, template_path)
-        # if mse < min_measure:
-        #     min_measure = mse
-        #     best_template_filename = template_filename
-
-    # if min_diff_pixels > 0:
-    #     print(f"min_diff_pixels: {min_diff_pixels}")
-    #     print(f"captured_cell_path: {captured_cell_path}")
-    #     print(f"best_template_filename: {best_template_filename}")
-    #     return 1 / 0
-
-    if best_template_filename is not None:
-        imwrite(
-            "best_template.png",
-            imread(os.path.join(templates_directory, best_template_filename)),
-        )
-        return best_template_filename, min_measure
-    else:
-        return None, None
+def get_images_directory():
+    """템플릿 이미지들이 있는 images 폴더. 실행 위치와 상관없이 저장소 기준으로 찾습니다"""
+    return os.path.normpath(
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "images")
+    )
 
 
-def find_best_fit_cells(window_title, cell_size, rule):
-    screenshot_path = f"{window_title}.png"
-    cell_coordinates = get_cropped_cell_coordinates(window_title, cell_size)
-    screenshot = imread(screenshot_path)
-    temp_dir = "C:/dev/14mv/temp"
-    current_directory = os.path.dirname(os.path.abspath(__file__))
+def get_templates_directory(window_title, rule):
+    images_directory = get_images_directory()
     if "W" in rule and not "W'" in rule:
         template_folder = "W"
     elif "N" in rule:
         template_folder = "N"
     else:
         template_folder = "V"
-    templates_directory = os.path.join(
-        current_directory, "..", "images", window_title, template_folder
-    )
-    best_fit_filenames = [[] for _ in range(len(cell_coordinates))]
-    for row_idx, row in enumerate(cell_coordinates):
-        for coordinates in row:
-            x1, y1, x2, y2 = coordinates
-            captured_cell = screenshot[y1:y2, x1:x2]
-            captured_cell_filename = os.path.join(
-                temp_dir, f"captured_cell_{coordinates[0]}_{coordinates[1]}.png"
-            )
-            imwrite(captured_cell_filename, captured_cell)
-            best_template_filename, _ = find_best_template_filename(
-                window_title, captured_cell_filename, templates_directory
+    templates_directory = os.path.join(images_directory, window_title, template_folder)
+    if not os.path.isdir(templates_directory):
+        ## Minesweeper Variants 2 는 규칙별 폴더 없이 바로 템플릿이 있음
+        templates_directory = os.path.join(images_directory, window_title)
+    return os.path.normpath(templates_directory)
+
+
+class TemplateBank:
+    """템플릿 폴더 하나를 (N, h, w, 3) 배열로 한번에 올려둔 것"""
+
+    def __init__(
+        self,
+        filenames: list[str],
+        templates: np.ndarray,
+        fingerprints: np.ndarray | None = None,
+        labels: list[int] | None = None,
+        packed: np.ndarray | None = None,
+    ):
+        self.filenames = filenames
+        self.templates = templates
+        if packed is None:
+            packed = pack_pixels(templates)
+        self.packed = packed
+        if fingerprints is None and filenames:
+            fingerprints = get_fingerprints(templates)
+        self.fingerprints = fingerprints
+        if labels is None:
+            labels = [parse_cell_for_numeric(filename) for filename in filenames]
+        self.labels = labels
+        self.label_by_filename = dict(zip(filenames, labels))
+
+    @classmethod
+    def load(cls, templates_directory) -> "TemplateBank":
+        """폴더의 아틀라스가 PNG 들과 맞으면 그것을, 아니면 PNG 를 읽어서 아틀라스를 다시 만듭니다"""
+        sources = get_template_sources(templates_directory)
+        if not sources:
+            return cls([], np.empty((0, 0, 0, 3), dtype=np.uint8))
+        atlas_path = os.path.join(templates_directory, ATLAS_FILENAME)
+        bank = read_template_atlas(atlas_path, sources)
+        if bank is None:
+            bank = cls.load_pngs(templates_directory, list(sources))
+            try:
+                write_template_atlas(atlas_path, bank, sources)
+            except OSError as e:
+                print(f"Error writing template atlas: {e}")
+        return bank
+
+    @classmethod
+    def load_pngs(cls, templates_directory, filenames) -> "TemplateBank":
+        templates = np.stack(
+            [
+                imread(os.path.join(templates_directory, filename))
+                for filename in filenames
+            ]
+        )
+        return cls(filenames, templates)
+
+    def __len__(self) -> int:
+        return len(self.filenames)
+
+    def subset(self, filenames: list[str]) -> "TemplateBank":
+        indices = [self.filenames.index(filename) for filename in filenames]
+        return TemplateBank(
+            filenames,
+            self.templates[indices],
+            self.fingerprints[indices] if indices else None,
+            [self.labels[index] for index in indices],
+            self.packed[indices],
+        )
+
+    def to_numeric(self, best_fit_cells) -> list[list[int]]:
+        """인식된 템플릿 파일명 grid 를 아틀라스에 저장된 숫자값으로 바꿉니다"""
+        return [
+            [self.label_by_filename[filename] for filename in row]
+            for row in best_fit_cells
+        ]
+
+
+## 아틀라스 파일: MAGIC, 헤더 길이(uint32), JSON 헤더, 정렬된 배열들 순서
+ATLAS_FILENAME = "templates.atlas"
+ATLAS_MAGIC = b"MVATLAS2"
+ATLAS_ALIGNMENT = 64
+
+
+def get_template_sources(templates_directory) -> dict[str, list[int]]:
+    """PNG 파일명 -> [수정시각(ns), 크기]. 아틀라스가 최신인지 확인하는 데 씁니다"""
+    sources = {}
+    for filename in sorted(os.listdir(templates_directory)):
+        if filename.endswith(".png"):
+            stat = os.stat(os.path.join(templates_directory, filename))
+            sources[filename] = [stat.st_mtime_ns, stat.st_size]
+    return sources
+
+
+def write_template_atlas(atlas_path, bank: TemplateBank, sources):
+    arrays = {
+        "templates": bank.templates,
+        "packed": bank.packed,
+        "fingerprints": bank.fingerprints,
+    }
+    layout, offset = {}, 0
+    for name, array in arrays.items():
+        layout[name] = {
+            "offset": offset,
+            "shape": list(array.shape),
+            "dtype": array.dtype.str,
+        }
+        offset += -(-array.nbytes // ATLAS_ALIGNMENT) * ATLAS_ALIGNMENT
+    header = json.dumps(
+        {
+            "sources": sources,
+            "filenames": bank.filenames,
+            "labels": bank.labels,
+            "arrays": layout,
+        }
+    ).encode()
+    data_start = len(ATLAS_MAGIC) + 4 + len(header)
+    padding = -data_start % ATLAS_ALIGNMENT
+
+    temporary_path = f"{atlas_path}.tmp"
+    with open(temporary_path, "wb") as f:
+        f.write(ATLAS_MAGIC)
+        f.write(np.uint32(len(header)).tobytes())
+        f.write(header)
+        f.write(b"\0" * padding)
+        for name, array in arrays.items():
+            data = np.ascontiguousarray(array).tobytes()
+            f.write(data)
+            f.write(b"\0" * (-len(data) % ATLAS_ALIGNMENT))
+    os.replace(temporary_path, atlas_path)
+
+
+def read_template_atlas(atlas_path, sources=None) -> TemplateBank | None:
+    """
+    아틀라스를 메모리 매핑으로 엽니다. 없거나 sources 와 다르거나
+    헤더가 깨졌거나 파일이 잘렸으면 None 을 반환해서 다시 만들게 합니다.
+    """
+    if not os.path.exists(atlas_path):
+        return None
+    try:
+        with open(atlas_path, "rb") as f:
+            if f.read(len(ATLAS_MAGIC)) != ATLAS_MAGIC:
+                return None
+            header_length = int(np.frombuffer(f.read(4), dtype=np.uint32)[0])
+            header = json.loads(f.read(header_length))
+        if sources is not None and header["sources"] != sources:
+            return None
+        data_start = len(ATLAS_MAGIC) + 4 + header_length
+        data_start += -data_start % ATLAS_ALIGNMENT
+        arrays = {
+            name: np.memmap(
+                atlas_path,
+                dtype=np.dtype(array["dtype"]),
+                mode="r",
+                offset=data_start + array["offset"],
+                shape=tuple(array["shape"]),
             )
-            best_fit_filenames[row_idx].append(best_template_filename)
-    return best_fit_filenames
+            for name, array in header["arrays"].items()
+        }
+        return TemplateBank(
+            header["filenames"],
+            arrays["templates"],
+            arrays["fingerprints"],
+            header["labels"],
+            arrays["packed"],
+        )
+    except (ValueError, KeyError, TypeError, IndexError) as e:
+        ## json.JSONDecodeError 도 ValueError. 잘린 파일은 np.memmap 이 ValueError
+        print(f"Error reading template atlas {atlas_path}: {e}")
+        return None
+
+
+def build_template_atlases(images_directory=None) -> list[str]:
+    """images 아래 템플릿 폴더마다 아틀라스를 (필요하면) 새로 만들고 경로들을 반환합니다"""
+    if images_directory is None:
+        images_directory = get_images_directory()
+    atlas_paths = []
+    for directory, _, filenames in sorted(os.walk(images_directory)):
+        if any(filename.endswith(".png") for filename in filenames):
+            TemplateBank.load(directory)
+            atlas_paths.append(os.path.join(directory, ATLAS_FILENAME))
+    return atlas_paths
+
+
+_template_banks: dict[str, TemplateBank] = {}
+_template_index: dict[tuple[str, int], TemplateBank] = {}
+
+
+def get_template_size_tag(filename) -> int | None:
+    """cell_1_s6.png 처럼 크기 전용 템플릿이면 그 크기를 반환"""
+    match = re.search(r"_s(\d+)$", os.path.splitext(filename)[0])
+    return int(match.group(1)) if match else None
+
+
+def select_size_templates(filenames, cell_size) -> list[str]:
+    """
+    해당 판 크기에서 쓸 수 있는 템플릿만 고릅니다.
+    크기 전용 템플릿(_s6)은 그 크기에서만 쓰고, 같은 이름의 일반 템플릿을 대신합니다.
+    """
+    sized_names = {
+        re.sub(r"_s\d+(?=\.)", "", filename)
+        for filename in filenames
+        if get_template_size_tag(filename) == cell_size
+    }
+    selected = []
+    for filename in filenames:
+        size_tag = get_template_size_tag(filename)
+        if size_tag is None and filename in sized_names:
+            continue
+        if size_tag is not None and size_tag != cell_size:
+            continue
+        selected.append(filename)
+    return selected
+
+
+def get_template_bank(templates_directory, cell_size=None) -> TemplateBank:
+    if templates_directory not in _template_banks:
+        _template_banks[templates_directory] = TemplateBank.load(templates_directory)
+    bank = _template_banks[templates_directory]
+    if cell_size is None:
+        return bank
+
+    key = (templates_directory, cell_size)
+    if key not in _template_index:
+        _template_index[key] = bank.subset(
+            select_size_templates(bank.filenames, cell_size)
+        )
+    return _template_index[key]
+
+
+def build_template_index(window_title, sizes=(5, 6, 7, 8)):
+    """시작할 때 한번 불러서 창의 모든 템플릿 폴더 x 판 크기 조합을 미리 만들어 둡니다"""
+    templates_directories = {
+        get_templates_directory(window_title, rule) for rule in ["V", "W", "N"]
+    }
+    for templates_directory in templates_directories:
+        for size in sizes:
+            get_template_bank(templates_directory, size)
+
+
+def get_cell_views(screenshot, window_title, size) -> np.ndarray:
+    """
+    스크린샷을 복사 없이 (size, size, h, w, 3) 셀 뷰로 자릅니다.
+    get_cropped_cell_coordinates 와 같은 좌표를 씁니다.
+    """
+    cell_coordinates = get_cropped_cell_coordinates(window_title, size)
+    x1, y1, x2, y2 = cell_coordinates[0][0]
+    cell_height, cell_width = y2 - y1, x2 - x1
+    if size > 1:
+        x_increment = cell_coordinates[0][1][0] - x1
+        y_increment = cell_coordinates[1][0][1] - y1
+    else:
+        x_increment, y_increment = cell_width, cell_height
+    last_x2, last_y2 = cell_coordinates[-1][-1][2:]
+    if last_y2 > screenshot.shape[0] or last_x2 > screenshot.shape[1]:
+        raise ValueError("screenshot is smaller than the board")
+    row_stride, col_stride, channel_stride = screenshot.strides
+    return np.lib.stride_tricks.as_strided(
+        screenshot[y1:, x1:],
+        shape=(size, size, cell_height, cell_width, screenshot.shape[2]),
+        strides=(
+            y_increment * row_stride,
+            x_increment * col_stride,
+            row_stride,
+            col_stride,
+            channel_stride,
+        ),
+        writeable=False,
+    )
+
+
+def pack_pixels(images: np.ndarray) -> np.ndarray:
+    """BGR 픽셀 세개를 uint32 하나로 합쳐서 픽셀 단위 비교를 한번에 하게 합니다"""
+    images = images.astype(np.uint32)
+    return images[..., 0] | (images[..., 1] << 8) | (images[..., 2] << 16)
+
+
+def count_different_pixels_batch(cells: np.ndarray, bank: TemplateBank) -> np.ndarray:
+    """(..., h, w, 3) 셀들과 모든 템플릿의 다른 픽셀 수를 (..., 템플릿 수) 로 반환"""
+    packed_cells = pack_pixels(cells)[..., None, :, :]
+    return np.count_nonzero(packed_cells != bank.packed, axis=(-2, -1))
+
+
+FINGERPRINT_BLOCKS = 5
+FINGERPRINT_TOP_K = 3
+
+
+def get_fingerprints(images: np.ndarray) -> np.ndarray:
+    """(n, h, w, 3) 이미지를 (n, 5, 5) 블록별 밝기(세 채널) 합으로 줄입니다"""
+    height, width = images.shape[-3:-1]
+    row_edges = np.linspace(0, height, FINGERPRINT_BLOCKS + 1).astype(int)
+    col_edges = np.linspace(0, width, FINGERPRINT_BLOCKS + 1).astype(int)
+    corners = np.stack(
+        [
+            cv2.integral(np.ascontiguousarray(image))[np.ix_(row_edges, col_edges)]
+            for image in images
+        ]
+    ).sum(axis=-1)
+    return (
+        corners[:, 1:, 1:]
+        - corners[:, :-1, 1:]
+        - corners[:, 1:, :-1]
+        + corners[:, :-1, :-1]
+    )
+
+
+def fingerprint_lower_bounds(cell_fingerprints, template_fingerprints) -> np.ndarray:
+    """
+    다른 픽셀 수의 하한. 한 블록에서 세 채널 합이 d 만큼 다르면
+    그 블록에 다른 픽셀이 적어도 ceil(d / 765) 개 있어야 합니다.
+    """
+    diff = np.abs(cell_fingerprints[:, None] - template_fingerprints[None])
+    return ((diff + 764) // 765).sum(axis=(-2, -1))
+
+
+def find_best_template_indices(
+    cells: np.ndarray, bank: TemplateBank, top_k=FINGERPRINT_TOP_K
+):
+    """
+    셀마다 다른 픽셀이 가장 적은 템플릿(같으면 앞 번호)을 찾습니다.
+    top_k 가 있으면 fingerprint 하한이 작은 top_k 개만 픽셀 비교하고,
+    하한으로 나머지를 배제할 수 없는 셀만 전체 비교해서 결과는 전체 비교와 같습니다.
+    """
+    if top_k is None or top_k >= len(bank):
+        diff_pixels = count_different_pixels_batch(cells, bank)
+        best_indices = np.argmin(diff_pixels, axis=-1)
+        min_measures = np.take_along_axis(diff_pixels, best_indices[..., None], axis=-1)
+        return best_indices, min_measures[..., 0]
+
+    leading_shape = cells.shape[:-3]
+    cells = cells.reshape(-1, *cells.shape[-3:])
+    lower_bounds = fingerprint_lower_bounds(get_fingerprints(cells), bank.fingerprints)
+    order = np.argsort(lower_bounds, axis=1, kind="stable")
+    candidates = order[:, :top_k]
+    packed_cells = pack_pixels(cells)
+    candidate_diffs = np.count_nonzero(
+        packed_cells[:, None] != bank.packed[candidates], axis=(-2, -1)
+    )
+    best_candidates = np.argmin(candidate_diffs * len(bank) + candidates, axis=1)
+    rows = np.arange(len(cells))
+    best_indices = candidates[rows, best_candidates]
+    min_measures = candidate_diffs[rows, best_candidates]
+
+    ## 하한으로 나머지 템플릿을 배제할 수 없는 셀들은 한번에 전체 비교합니다
+    next_lower_bounds = lower_bounds[rows, order[:, top_k]]
+    fallback_rows = np.flatnonzero(next_lower_bounds <= min_measures)
+    if len(fallback_rows):
+        diff_pixels = np.count_nonzero(
+            packed_cells[fallback_rows, None] != bank.packed, axis=(-2, -1)
+        )
+        fallback_indices = np.argmin(diff_pixels, axis=1)
+        best_indices[fallback_rows] = fallback_indices
+        min_measures[fallback_rows] = diff_pixels[
+            np.arange(len(fallback_rows)), fallback_indices
+        ]
+    return best_indices.reshape(leading_shape), min_measures.reshape(leading_shape)
+
+
+def find_best_template_filename(
+    window_title, captured_cell_path, templates_directory, cell_size=None
+):
+    bank = get_template_bank(templates_directory, cell_size)
+    if not len(bank):
+        return None, None
+    captured_cell = imread(captured_cell_path)
+    best_indices, min_measures = find_best_template_indices(captured_cell[None], bank)
+    return bank.filenames[best_indices[0]], int(min_measures[0])
+
+
+class CellRecognitionCache:
+    """
+    셀 이미지 해시 -> 인식된 템플릿 파일명 캐시 (LRU).
+    키에 창 제목, 판 크기, 템플릿 폴더를 같이 넣어서 서로 섞이지 않게 합니다.
+    """
+
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[tuple, str] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key) -> str | None:
+        filename = self._entries.get(key)
+        if filename is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return filename
+
+    def put(self, key, filename):
+        self._entries[key] = filename
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+recognition_cache = CellRecognitionCache()
+
+
+def get_cell_digest(cell: np.ndarray) -> bytes:
+    return hashlib.blake2b(cell.tobytes(), digest_size=16).digest()
+
+
+def get_cell_digests(cells: np.ndarray) -> list[list[bytes]]:
+    return [[get_cell_digest(cell) for cell in row] for row in cells]
+
+
+def match_cells(cells, positions, digests, bank, cache, cache_prefix):
+    """
+    positions 의 셀들만 인식해서 {(row, col): 템플릿 파일명} 으로 반환합니다.
+    캐시에 없는 셀만 템플릿과 비교하고, 같은 프레임 안의 중복 셀은 한번만 비교합니다.
+    """
+    matched = {}
+    missed_positions: dict[tuple, list[tuple[int, int]]] = {}
+    for row, col in positions:
+        key = (*cache_prefix, digests[row][col])
+        if key in missed_positions:
+            missed_positions[key].append((row, col))
+            continue
+        filename = cache.get(key)
+        if filename is None:
+            missed_positions[key] = [(row, col)]
+        else:
+            matched[(row, col)] = filename
+
+    if missed_positions:
+        missed_rows, missed_cols = zip(
+            *(positions[0] for positions in missed_positions.values())
+        )
+        best_indices, _ = find_best_template_indices(
+            cells[list(missed_rows), list(missed_cols)], bank
+        )
+        for (key, positions), index in zip(missed_positions.items(), best_indices):
+            filename = bank.filenames[index]
+            cache.put(key, filename)
+            for position in positions:
+                matched[position] = filename
+    return matched
+
+
+def find_best_fit_cells(window_title, cell_size, rule, screenshot, cache=None):
+    if cache is None:
+        cache = recognition_cache
+    templates_directory = get_templates_directory(window_title, rule)
+    bank = get_template_bank(templates_directory, cell_size)
+    cells = get_cell_views(screenshot, window_title, cell_size)
+    positions = [(row, col) for row in range(cell_size) for col in range(cell_size)]
+    matched = match_cells(
+        cells,
+        positions,
+        get_cell_digests(cells),
+        bank,
+        cache,
+        (window_title, cell_size, templates_directory),
+    )
+    return [
+        [matched[(row, col)] for col in range(cell_size)] for row in range(cell_size)
+    ]
+
+
+class GridRecognizer:
+    """
+    이전 프레임의 셀 해시와 인식 결과를 기억해 두고 픽셀이 바뀐 셀만 다시 인식합니다.
+    changed_cells 에 마지막 recognize 에서 바뀐 셀 위치가 남고,
+    grid 에는 템플릿 아틀라스의 숫자값으로 바꾼 결과가 같이 남습니다.
+    """
+
+    def __init__(self, cache=None):
+        self.cache = recognition_cache if cache is None else cache
+        self.config = None
+        self.digests = None
+        self.best_fit_cells = None
+        self.grid = None
+        self.changed_cells: set[tuple[int, int]] = set()
+
+    def reset(self):
+        self.config = None
+        self.digests = None
+        self.best_fit_cells = None
+        self.grid = None
+        self.changed_cells = set()
+
+    def recognize(self, window_title, cell_size, rule, screenshot) -> list[list[str]]:
+        templates_directory = get_templates_directory(window_title, rule)
+        config = (window_title, cell_size, templates_directory)
+        cells = get_cell_views(screenshot, window_title, cell_size)
+        digests = get_cell_digests(cells)
+
+        if config != self.config:
+            self.reset()
+            self.config = config
+            self.best_fit_cells = [[None] * cell_size for _ in range(cell_size)]
+            self.grid = [[None] * cell_size for _ in range(cell_size)]
+            changed = [(r, c) for r in range(cell_size) for c in range(cell_size)]
+        else:
+            changed = [
+                (r, c)
+                for r in range(cell_size)
+                for c in range(cell_size)
+                if digests[r][c] != self.digests[r][c]
+            ]
+
+        if changed:
+            bank = get_template_bank(templates_directory, cell_size)
+            matched = match_cells(cells, changed, digests, bank, self.cache, config)
+            best_fit_cells = [row[:] for row in self.best_fit_cells]
+            grid = [row[:] for row in self.grid]
+            for (row, col), filename in matched.items():
+                best_fit_cells[row][col] = filename
+                grid[row][col] = bank.label_by_filename[filename]
+            self.best_fit_cells = best_fit_cells
+            self.grid = grid
+        self.digests = digests
+        self.changed_cells = set(changed)
+        return self.best_fit_cells
+
+    def recognize_grid(self, window_title, cell_size, rule, screenshot):
+        """recognize 와 같지만 파일명 대신 숫자 grid 를 반환합니다"""
+        self.recognize(window_title, cell_size, rule, screenshot)
+        return self.grid
 
 
 def parse_cell_for_numeric(filename):
@@ -226,65 +841,173 @@ class PuzzleStatus(Enum):
     ALREADY_SOLVED = "Already Solved"
 
 
-def completed_check(screenshot_path) -> PuzzleStatus:
+YELLOW = (0, 255, 255)
+DARK_YELLOW = (0, 178, 178)
+RED = (0, 0, 255)  # ultimate mode
+DARK_RED = (0, 0, 178)
+BLACK = (0, 0, 0)
+POPUP_BORDER = (126, 126, 126)
+POPUP_INSIDE = (45, 45, 45)
+
+## 위에서부터 처음 맞는 것이 결과. 점은 (x, y), 영역은 (x1, y1, x2, y2) 이고
+## 기대값은 BGR 색 또는 같은 영역을 잘라올 기준 이미지 파일명입니다.
+STATUS_PROBES = [
+    {
+        "status": PuzzleStatus.FINISH,  ## 체크표시
+        "probes": [((833, 51), YELLOW), ((868, 65), YELLOW)],
+    },
+    {
+        "status": PuzzleStatus.NEXT,
+        "probes": [((833, 51), DARK_YELLOW), ((863, 70), DARK_YELLOW)],
+    },
+    {
+        "status": PuzzleStatus.NEXT,
+        "probes": [((833, 51), DARK_RED), ((863, 70), DARK_RED)],
+    },
+    {
+        "status": PuzzleStatus.ALREADY_SOLVED,  ## 빨리감기표시
+        "probes": [((863, 70), RED)],
+    },
+    {
+        "status": PuzzleStatus.STAR_BROKEN,
+        "probes": [((41, 580), BLACK)],
+    },
+    {
+        "status": PuzzleStatus.WRONG_POPUP,
+        "probes": [((89, 112), POPUP_BORDER), ((945, 520), POPUP_INSIDE)],
+    },
+]
+
+ALL_SOLVED_PROBES = [
+    {
+        "status": True,
+        "probes": [((946, 571, 1024, 593), "size_skipper.png")],
+    },
+]
+
+
+class ProbeTable:
+    """
+    STATUS_PROBES 같은 표를 점 좌표 배열로 펼쳐 두고
+    프레임(또는 프레임 묶음)에서 한번에 모아서 비교합니다.
+    창 전체 대신 regions 만 잘라 찍었다면 match_regions 로 비교합니다.
+    """
+
+    def __init__(self, entries, default):
+        self.entries = entries
+        self.default = default
+        self._compiled = None
+
+    def compile(self):
+        xs, ys, expected, tolerances, entry_starts = [], [], [], [], []
+        regions, region_offsets, pixel_index = [], {}, []
+        region_pixels = 0
+        for entry in self.entries:
+            entry_starts.append(len(xs))
+            tolerance = entry.get("tolerance", 0)
+            for position, expected_value in entry["probes"]:
+                if len(position) == 2:
+                    x1, y1 = position
+                    x2, y2 = x1 + 1, y1 + 1
+                else:
+                    x1, y1, x2, y2 = position
+                area = (y2 - y1) * (x2 - x1)
+                region = (x1, y1, x2, y2)
+                if region not in region_offsets:
+                    region_offsets[region] = region_pixels
+                    region_pixels += area
+                    regions.append(region)
+                if isinstance(expected_value, str):
+                    colors = imread(expected_value)[y1:y2, x1:x2].reshape(-1, 3)
+                else:
+                    colors = np.tile(expected_value, (area, 1))
+                grid_y, grid_x = np.mgrid[y1:y2, x1:x2]
+                ys.extend(grid_y.ravel())
+                xs.extend(grid_x.ravel())
+                pixel_index.extend(
+                    range(region_offsets[region], region_offsets[region] + area)
+                )
+                expected.append(colors)
+                tolerances.extend([tolerance] * len(colors))
+        self.regions = regions
+        self._compiled = (
+            np.array(ys),
+            np.array(xs),
+            np.concatenate(expected).astype(np.int16),
+            np.array(tolerances)[:, None],
+            np.array(entry_starts),
+            np.array(pixel_index),
+        )
+        return self._compiled
+
+    def get_regions(self) -> list[tuple[int, int, int, int]]:
+        """비교에 필요한 (x1, y1, x2, y2) 영역들. 겹치는 점은 한번만 들어갑니다"""
+        if self._compiled is None:
+            self.compile()
+        return self.regions
+
+    def _match_pixels(self, pixels: np.ndarray) -> list:
+        _, _, expected, tolerances, entry_starts, _ = self._compiled
+        matched = (np.abs(pixels.astype(np.int16) - expected) <= tolerances).all(
+            axis=-1
+        )
+        entry_matched = np.logical_and.reduceat(matched, entry_starts, axis=1)
+        results = []
+        for row in entry_matched:
+            hits = np.flatnonzero(row)
+            results.append(
+                self.entries[hits[0]]["status"] if len(hits) else self.default
+            )
+        return results
+
+    def match_stack(self, frames: np.ndarray) -> list:
+        """(n, H, W, 3) 프레임 묶음의 결과를 리스트로 반환합니다"""
+        ys, xs = (self._compiled or self.compile())[:2]
+        if ys.max() >= frames.shape[1] or xs.max() >= frames.shape[2]:
+            return [self.default] * len(frames)
+        return self._match_pixels(frames[:, ys, xs])
+
+    def match(self, frame: np.ndarray):
+        return self.match_stack(frame[None])[0]
+
+    def match_regions(self, patches: list[np.ndarray]):
+        """get_regions() 순서대로 잘라 찍은 patch 들로 결과를 구합니다"""
+        pixel_index = (self._compiled or self.compile())[5]
+        if len(patches) != len(self.regions) or any(
+            patch.shape[:2] != (y2 - y1, x2 - x1)
+            for patch, (x1, y1, x2, y2) in zip(patches, self.regions)
+        ):
+            return self.default
+        pixels = np.concatenate([patch.reshape(-1, 3) for patch in patches])
+        return self._match_pixels(pixels[pixel_index][None])[0]
+
+
+status_probe_table = ProbeTable(STATUS_PROBES, PuzzleStatus.INCOMPLETE)
+all_solved_probe_table = ProbeTable(ALL_SOLVED_PROBES, False)
+
+
+def completed_check(screenshot) -> PuzzleStatus:
     """
     스크린샷에서 다음 문제로 넘어갈지 확인합니다.
 
     Args:
-        screenshot_path (str): 스크린샷 이미지 파일 경로
+        screenshot (np.ndarray): capture_window_screenshot 으로 받은 BGR 프레임
     """
     try:
-        screenshot = imread(screenshot_path)
         if screenshot is None:
-            return False
-        yellow = (0, 255, 255)
-        dark_yellow = (0, 178, 178)
-        # ultimate mode
-        red = (0, 0, 255)
-        dark_red = (0, 0, 178)
-        black = (0, 0, 0)
-        color1 = screenshot[51, 833]
-        color2 = screenshot[65, 868]
-        color3 = screenshot[70, 863]
-        if (color1 == yellow).all() and (color2 == yellow).all():
-            return PuzzleStatus.FINISH  ## 체크표시
-        if (color1 == dark_yellow).all() and (color3 == dark_yellow).all():
-            return PuzzleStatus.NEXT
-        if (color1 == dark_red).all() and (color3 == dark_red).all():
-            return PuzzleStatus.NEXT
-
-        color4 = screenshot[70, 863]
-        color5 = screenshot[70, 863]
-        if (color4 == red).all() and (color5 == red).all():
-            return PuzzleStatus.ALREADY_SOLVED  ## 빨리감기표시
-
-        color_LD = screenshot[580, 41]
-        if (color_LD == black).all():
-            return PuzzleStatus.STAR_BROKEN
-
-        color_LU = screenshot[112, 89]
-        color_RD = screenshot[520, 945]
-        popup_border = (126, 126, 126)
-        popup_inside = (45, 45, 45)
-        if (color_LU == popup_border).all() and (color_RD == popup_inside).all():
-            return PuzzleStatus.WRONG_POPUP
-
-        return PuzzleStatus.INCOMPLETE
-
+            return PuzzleStatus.INCOMPLETE
+        return status_probe_table.match(screenshot)
     except Exception as e:
         print(f"Error checking pixel colors: {e}")
         return PuzzleStatus.INCOMPLETE
 
 
-def all_solved_check(window_title):
-    capture_window_screenshot(window_title)
-    current_screenshot = imread(f"{window_title}.png")
-    reference_image = imread("size_skipper.png")
-    x1, y1, x2, y2 = 946, 571, 1024, 593
-    current_region = current_screenshot[y1:y2, x1:x2]
-    reference_region = reference_image[y1:y2, x1:x2]
-    if current_region.shape == reference_region.shape:
-        return np.array_equal(current_region, reference_region)
-    else:
-        print("Region dimensions don't match")
-        return False
+def all_solved_check(window_title, screenshot=None):
+    if screenshot is None:
+        patches = capture_window_regions(
+            window_title, all_solved_probe_table.get_regions()
+        )
+        if patches is None:
+            return False
+        return all_solved_probe_table.match_regions(patches)
+    return all_solved_probe_table.match(screenshot)
@@ -1,14 +1,31 @@
+import hashlib
 from typing import Iterator
 
+import numpy as np
 from pydantic import BaseModel
 from itertools import groupby
 
 from window.const import RULE_Q, RULE_T, SPECIAL_CELLS
 
 
-class Region(BaseModel):
-    mines_needed: int
-    blank_cells: set[tuple[int, int]]
+class Region:
+    """
+    blank_cells 중에 mines_needed 개가 지뢰인 영역.
+    hint_utils 의 조합 탐색에서 수없이 만들어지므로 pydantic 검증 없이
+    __slots__ 와 frozenset 으로 만들고, 만든 뒤에는 바꾸지 않습니다.
+    """
+
+    __slots__ = ("mines_needed", "blank_cells")
+
+    def __init__(self, mines_needed: int, blank_cells: set[tuple[int, int]]):
+        object.__setattr__(self, "mines_needed", mines_needed)
+        object.__setattr__(self, "blank_cells", frozenset(blank_cells))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Region is immutable: cannot set {name}")
+
+    def __reduce__(self):
+        return Region, (self.mines_needed, self.blank_cells)
 
     @property
     def total_blanks(self) -> int:
@@ -21,6 +38,15 @@ class Region(BaseModel):
     def __eq__(self, other: "Region") -> bool:
         return self.blank_cells == other.blank_cells
 
+    def __hash__(self) -> int:
+        return hash(self.blank_cells)
+
+    def __repr__(self) -> str:
+        return (
+            f"Region(mines_needed={self.mines_needed}, "
+            f"blank_cells={set(self.blank_cells)})"
+        )
+
     def __sub__(self, other: "Region") -> "Region":
         return Region(
             mines_needed=self.mines_needed - other.mines_needed,
@@ -95,29 +121,76 @@ class GridRegion(BaseModel):
     pre_filled_numbers: list[tuple[int, int]]
 
 
-class ExpandedRegion(BaseModel):
-    blank_cells: list[tuple[int, int]]
-    cases: list[int]
+def sorted_unique_cases(cases: np.ndarray) -> np.ndarray:
+    """정렬하고 중복을 뺍니다. (np.unique 는 uint64 에서 sort 보다 훨씬 느림)"""
+    cases = np.sort(cases)
+    if len(cases) > 1:
+        keep = np.empty(len(cases), dtype=bool)
+        keep[0] = True
+        np.not_equal(cases[1:], cases[:-1], out=keep[1:])
+        cases = cases[keep]
+    return cases
+
+
+class ExpandedRegion:
+    """
+    blank_cells 의 i 번째 칸이 case 의 i 번째 비트(1 이면 지뢰)인 case 들.
+    cases 는 정렬하고 중복을 뺀 np.uint64 배열로 한번만 만들어 둡니다.
+    비교는 cases 의 digest 로 먼저 거릅니다.
+    """
 
-    def __init__(self, blank_cells: list[tuple[int, int]], cases: list[int]):
+    __slots__ = ("blank_cells", "cases", "_digest")
+
+    def __init__(self, blank_cells: list[tuple[int, int]], cases):
         # blank_cells.sort() ## cases의 값이 바뀌므로 금지. 중복 제거를 위해 미리 정렬된 상태로 들어와야 함
-        cases.sort()
-        super().__init__(blank_cells=blank_cells, cases=cases)
+        self.blank_cells = blank_cells
+        self.cases = sorted_unique_cases(np.asarray(cases, dtype=np.uint64))
+        self.cases.flags.writeable = False
+        self._digest = None
+
+    @classmethod
+    def from_sorted_cases(
+        cls, blank_cells: list[tuple[int, int]], cases: np.ndarray
+    ) -> "ExpandedRegion":
+        """이미 정렬되고 중복이 없는 uint64 배열이면 다시 정렬하지 않습니다"""
+        region = cls.__new__(cls)
+        region.blank_cells = blank_cells
+        region.cases = cases
+        region.cases.flags.writeable = False
+        region._digest = None
+        return region
+
+    @property
+    def digest(self) -> bytes:
+        if self._digest is None:
+            self._digest = hashlib.blake2b(
+                self.cases.tobytes(), digest_size=16
+            ).digest()
+        return self._digest
 
     def __eq__(self, other: "ExpandedRegion") -> bool:
-        return all(
-            [
-                set(self.blank_cells) == set(other.blank_cells),
-                set(self.cases) == set(other.cases),
-            ]
+        if not isinstance(other, ExpandedRegion):
+            return NotImplemented
+        return (
+            len(self.cases) == len(other.cases)
+            and self.digest == other.digest
+            and set(self.blank_cells) == set(other.blank_cells)
+            and np.array_equal(self.cases, other.cases)
         )
 
+    def __hash__(self) -> int:
+        return hash((frozenset(self.blank_cells), self.digest))
+
+    def __repr__(self) -> str:
+        cases = self.cases.tolist()
+        return f"ExpandedRegion(blank_cells={self.blank_cells}, cases={cases})"
+
     @property
     def case_count(self) -> int:
         return len(self.cases)
 
     def get_case(self, case_index: int) -> Iterator[tuple[tuple[int, int], bool]]:
-        case = self.cases[case_index]
+        case = int(self.cases[case_index])
         for i, cell in enumerate(self.blank_cells):
             has_mine = bool(case & (1 << i))
             yield cell, has_mine
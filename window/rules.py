@@ -1,91 +1,323 @@
-from window.const import SPECIAL_CELLS
+from enum import Enum
+from functools import lru_cache
+from typing import NamedTuple
+
+import numpy as np
+
+from window.board import Board, as_board
 from window.region import ExpandedRegion, Region
 
 
-def is_valid_case_for_rule(
-    applied_grid: list[list[int]],
-    rule: dict,
-) -> bool:
-    height = len(applied_grid)
-    width = len(applied_grid[0])
-    rule_directions = rule["directions"]
-    pattern_condition = rule["pattern_condition"]
+class PatternCondition(Enum):
+    NO_ALL_MINES = "no_all_mines"
+    MAX_TWO_MINES = "max_two_mines"
+    EXACT_TWO_MINES = "exact_two_mines"
+    EXACT_THREE_MINES = "exact_three_mines"
+    NO_ALL_NUMBERS = "no_all_numbers"
+    CROSS_D = "cross_D"
 
-    for row in range(height):
-        for col in range(width):
-            for direction in rule_directions:
-                valid = True
-                cells = []
+
+MINE_LIMITS = {
+    PatternCondition.MAX_TWO_MINES: 2,
+    PatternCondition.EXACT_TWO_MINES: 2,
+    PatternCondition.EXACT_THREE_MINES: 3,
+}
+
+
+class CompiledRule(NamedTuple):
+    """
+    판 크기 하나에 대해 펼쳐 둔 좌측 규칙. 판 안에 다 들어오는 창만 남깁니다.
+    windows 는 창 마스크, centers 는 cross_D 의 가운데 칸 비트(그 외는 0),
+    shifts 는 direction 마다 (시작칸 마스크, 칸별 비트 shift) 로
+    "창이 전부 지뢰/숫자" 를 창 하나씩 안 보고 비트 연산 몇 번으로 확인할 때 씁니다.
+    cell_windows / cell_anchors 는 칸마다 그 칸을 지나는 창(번호 비트셋, 시작칸 마스크)으로
+    split_rule 에서 region 이 건드리는 창만 골라낼 때 씁니다.
+    """
+
+    name: str
+    condition: PatternCondition
+    windows: tuple[int, ...]
+    centers: tuple[int, ...]
+    shifts: tuple[tuple[int, tuple[int, ...]], ...]
+    cell_windows: tuple[int, ...] = ()
+    cell_anchors: tuple[tuple[int, ...], ...] = ()
+
+    def is_valid(self, mine: int, number: int) -> bool:
+        condition = self.condition
+        if condition == PatternCondition.NO_ALL_MINES:
+            return not self._any_window_filled(mine)
+        elif condition == PatternCondition.NO_ALL_NUMBERS:
+            return not self._any_window_filled(number)
+        elif condition == PatternCondition.CROSS_D:
+            for window, center in zip(self.windows, self.centers):
+                if mine & center:
+                    others = window ^ center
+                    if others & number == others:
+                        return False
+                    if (mine & others).bit_count() >= 2:
+                        return False
+            return True
+
+        limit = MINE_LIMITS[condition]
+        for window in self.windows:
+            if (mine & window).bit_count() > limit:
+                return False
+        if condition != PatternCondition.MAX_TWO_MINES:
+            for window in self.windows:
+                if window.bit_count() - (number & window).bit_count() < limit:
+                    return False
+        return True
+
+    def _any_window_filled(self, mask: int) -> bool:
+        for anchors, offsets in self.shifts:
+            filled = anchors
+            for offset in offsets:
+                filled &= mask >> offset if offset >= 0 else mask << -offset
+                if not filled:
+                    break
+            if filled:
+                return True
+        return False
+
+
+_compiled_rules = {}
+
+
+def compile_rule(rule: dict, height: int, width: int) -> CompiledRule:
+    """rule 을 (이름, 판 크기) 마다 한번만 펼쳐서 캐시합니다"""
+    name = rule.get("name")
+    key = (name, height, width)
+    if name is None:
+        directions = tuple(tuple(direction) for direction in rule["directions"])
+        key = (rule["pattern_condition"], directions, height, width)
+    if key in _compiled_rules:
+        return _compiled_rules[key]
+
+    condition = PatternCondition(rule["pattern_condition"])
+    windows, centers, shifts = [], [], []
+    seen = set()
+    for direction in rule["directions"]:
+        anchors = 0
+        for row in range(height):
+            for col in range(width):
+                window = 0
                 for dr, dc in direction:
                     new_row, new_col = row + dr, col + dc
                     if not (0 <= new_row < height and 0 <= new_col < width):
-                        valid = False
                         break
-                    cells.append(applied_grid[new_row][new_col])
-                if not valid:
-                    continue
+                    window |= 1 << (new_row * width + new_col)
+                else:
+                    anchors |= 1 << (row * width + col)
+                    center = 0
+                    if condition == PatternCondition.CROSS_D:
+                        dr, dc = direction[0]
+                        center = 1 << ((row + dr) * width + col + dc)
+                    if (window, center) not in seen:
+                        seen.add((window, center))
+                        windows.append(window)
+                        centers.append(center)
+        offsets = tuple(dr * width + dc for dr, dc in direction)
+        shifts.append((anchors, offsets))
 
-                blank_count = cells.count(SPECIAL_CELLS["blank"])
-                mine_count = cells.count(SPECIAL_CELLS["flag"])
-                number_count = len(cells) - blank_count - mine_count
-                if pattern_condition == "no_all_mines":
-                    if mine_count == len(cells):
-                        return False
-                elif pattern_condition == "max_two_mines":
-                    if mine_count > 2:
-                        return False
-                elif pattern_condition == "exact_two_mines":
-                    if mine_count > 2 or mine_count + blank_count < 2:
-                        return False
-                elif pattern_condition == "exact_three_mines":
-                    if mine_count > 3 or mine_count + blank_count < 3:
-                        return False
-                elif pattern_condition == "no_all_numbers":
-                    if number_count == len(cells):
-                        return False
-                elif pattern_condition == "cross_D":
-                    if cells[0] == SPECIAL_CELLS["flag"]:
-                        if all(
-                            cell not in [SPECIAL_CELLS["flag"], SPECIAL_CELLS["blank"]]
-                            for cell in cells[1:]
-                        ):
-                            return False
-                        flag_count = sum(
-                            1 for cell in cells[1:] if cell == SPECIAL_CELLS["flag"]
-                        )
-                        if flag_count >= 2:
-                            return False
+    cell_count = height * width
+    cell_windows = [0] * cell_count
+    for index, window in enumerate(windows):
+        for cell in range(cell_count):
+            if window >> cell & 1:
+                cell_windows[cell] |= 1 << index
+    cell_anchors = []
+    for anchors, offsets in shifts:
+        direction_anchors = []
+        for cell in range(cell_count):
+            mask = 0
+            for offset in offsets:
+                if 0 <= cell - offset < cell_count:
+                    mask |= 1 << (cell - offset)
+            direction_anchors.append(mask & anchors)
+        cell_anchors.append(tuple(direction_anchors))
+
+    compiled = CompiledRule(
+        name or condition.value,
+        condition,
+        tuple(windows),
+        tuple(centers),
+        tuple(shifts),
+        tuple(cell_windows),
+        tuple(cell_anchors),
+    )
+    _compiled_rules[key] = compiled
+    return compiled
+
+
+@lru_cache(maxsize=4096)
+def split_rule(
+    compiled: CompiledRule, region_mask: int
+) -> tuple[CompiledRule, CompiledRule]:
+    """
+    (region_mask 칸을 하나라도 지나는 창들, 나머지 창들) 로 나눕니다.
+    region 밖의 창은 case 마다 똑같으므로 원래 판에서 한번만 확인하면 됩니다.
+    """
+    touching = 0
+    touching_anchors = [0] * len(compiled.shifts)
+    mask = region_mask
+    while mask:
+        low = mask & -mask
+        cell = low.bit_length() - 1
+        touching |= compiled.cell_windows[cell]
+        for index, direction_anchors in enumerate(compiled.cell_anchors):
+            touching_anchors[index] |= direction_anchors[cell]
+        mask ^= low
+
+    parts = []
+    for inside in [True, False]:
+        windows, centers = [], []
+        for index, (window, center) in enumerate(
+            zip(compiled.windows, compiled.centers)
+        ):
+            if bool(touching >> index & 1) == inside:
+                windows.append(window)
+                centers.append(center)
+        shifts = []
+        for (anchors, offsets), touched in zip(compiled.shifts, touching_anchors):
+            anchors = anchors & touched if inside else anchors & ~touched
+            if anchors:
+                shifts.append((anchors, offsets))
+        parts.append(
+            CompiledRule(
+                compiled.name,
+                compiled.condition,
+                tuple(windows),
+                tuple(centers),
+                tuple(shifts),
+            )
+        )
+    return parts[0], parts[1]
+
+
+def localize_rule(
+    compiled: CompiledRule, board: Board, region_mask: int
+) -> CompiledRule | None:
+    """
+    region_mask 만 채워 볼 때 case 마다 확인할 창들. region 밖 창이 이미 틀렸으면
+    어떤 case 도 통과 못하니 None 을 반환합니다.
+    """
+    inside, outside = split_rule(compiled, region_mask)
+    if not outside.is_valid(board.mine, board.number):
+        return None
+    return inside
 
-    return True
+
+def is_valid_case_for_rule(
+    applied_grid: Board | list[list[int]],
+    rule: dict,
+) -> bool:
+    board = as_board(applied_grid)
+    compiled = compile_rule(rule, board.height, board.width)
+    return compiled.is_valid(board.mine, board.number)
+
+
+def get_case_constraints(
+    compiled: CompiledRule, board: Board, blank_cells: list[tuple[int, int]]
+) -> list[tuple[int, int, int, int]]:
+    """
+    localize_rule 로 남긴 창들을 region 비트 공간의 (given, mask, low, high) 로 옮깁니다.
+    given 비트가 전부 지뢰인 case 는 popcount(case & mask) 가 low 이상 high 이하여야 하고,
+    given 이 0 이면 모든 case 에 적용됩니다. region 밖 칸은 판의 값으로 미리 세어 둡니다.
+    """
+    cell_bits = [board.bit(row, col) for row, col in blank_cells]
+    region_mask = sum(cell_bits)
+
+    def to_region(mask):
+        region_bits = 0
+        for index, bit in enumerate(cell_bits):
+            if mask & bit:
+                region_bits |= 1 << index
+        return region_bits
+
+    def outside_counts(window):
+        outside = window & ~region_mask
+        return (board.mine & outside).bit_count(), (board.number & outside).bit_count()
+
+    condition = compiled.condition
+    constraints = []
+    for window, center in zip(compiled.windows, compiled.centers):
+        given = 0
+        if condition == PatternCondition.CROSS_D:
+            if center & region_mask:
+                given = to_region(center)
+            elif not board.mine & center:
+                continue
+            window ^= center
+        size = window.bit_count()
+        region_bits = to_region(window)
+        region_size = region_bits.bit_count()
+        mines, numbers = outside_counts(window)
+
+        if condition == PatternCondition.NO_ALL_MINES:
+            if mines + region_size < size:
+                continue
+            low, high = 0, region_size - 1
+        elif condition == PatternCondition.NO_ALL_NUMBERS:
+            if numbers + region_size < size:
+                continue
+            low, high = 1, region_size
+        elif condition == PatternCondition.CROSS_D:
+            ## 가운데가 지뢰면 나머지가 다 숫자면 안되고, 나머지 지뢰는 1개 이하
+            low = 1 if numbers + region_size == size else 0
+            high = 1 - mines
+        else:
+            limit = MINE_LIMITS[condition]
+            high = limit - mines
+            low = 0
+            if condition != PatternCondition.MAX_TWO_MINES:
+                low = limit - (size - numbers - region_size)
+        if low <= 0 and high >= region_size:
+            continue
+        constraints.append((given, region_bits, max(low, 0), high))
+    return list(dict.fromkeys(constraints))
+
+
+def filter_case_array(
+    cases: np.ndarray, constraints: list[tuple[int, int, int, int]]
+) -> np.ndarray:
+    """uint64 case 배열을 get_case_constraints 조건으로 한번에 거릅니다"""
+    for given, mask, low, high in constraints:
+        if low > high:
+            valid = np.zeros(len(cases), dtype=bool)
+        else:
+            counts = np.bitwise_count(cases & np.uint64(mask))
+            valid = (counts >= low) & (counts <= high)
+        if given:
+            valid |= (cases & np.uint64(given)) != np.uint64(given)
+        cases = cases[valid]
+        if not len(cases):
+            break
+    return cases
 
 
 def filter_cases_by_rule(
     expanded_region: ExpandedRegion,
-    grid: list[list[int]],
+    grid: Board | list[list[int]],
     rule: dict,
 ) -> ExpandedRegion:
+    board = as_board(grid)
     blank_cells = expanded_region.blank_cells
-    cases = expanded_region.cases
-    filtered_cases = []
-    for case in cases:
-        applied_grid = [row[:] for row in grid]
-        for idx, cell in enumerate(blank_cells):
-            row, col = cell
-            if case & (1 << idx):
-                applied_grid[row][col] = SPECIAL_CELLS["flag"]
-            else:
-                applied_grid[row][col] = SPECIAL_CELLS["star"]
-        if is_valid_case_for_rule(applied_grid, rule):
-            filtered_cases.append(case)
-
-    return ExpandedRegion(blank_cells=blank_cells, cases=filtered_cases)
-
+    region_mask = board.cells_to_mask(blank_cells)
+    compiled = localize_rule(
+        compile_rule(rule, board.height, board.width), board, region_mask
+    )
+    if compiled is None:
+        return ExpandedRegion(blank_cells=blank_cells, cases=[])
+    constraints = get_case_constraints(compiled, board, blank_cells)
+    filtered_cases = filter_case_array(expanded_region.cases, constraints)
 
+    return ExpandedRegion.from_sorted_cases(blank_cells, filtered_cases)
 
 
 def get_expanded_regions_by_rule(grid, rule) -> list[ExpandedRegion]:
-    height = len(grid)
-    width = len(grid[0])
+    board = as_board(grid)
+    height = board.height
+    width = board.width
     directions = rule["directions"]
     pattern_condition = rule["pattern_condition"]
     expanded_regions = []
@@ -116,11 +348,11 @@ def get_expanded_regions_by_rule(grid, rule) -> list[ExpandedRegion]:
                         continue
 
                 for r, c in pattern_cells:
-                    cell_value = grid[r][c]
-                    if cell_value == SPECIAL_CELLS["blank"]:
+                    bit = board.bit(r, c)
+                    if board.blank & bit:
                         blank_cells.append((r, c))
                         num_blanks += 1
-                    elif cell_value == SPECIAL_CELLS["flag"]:
+                    elif board.mine & bit:
                         existing_mines += 1
                     else:
                         existing_numbers += 1
@@ -155,7 +387,7 @@ def get_expanded_regions_by_rule(grid, rule) -> list[ExpandedRegion]:
                 elif pattern_condition == "cross_D":
                     center_r, center_c = center_cell
                     # print(f"*** {center_cell} ******************")
-                    if grid[center_r][center_c] not in [-1, -2]:
+                    if not (board.blank | board.mine) & board.bit(center_r, center_c):
                         continue
                     for case in range(2**num_blanks):
                         if center_cell in blank_cells:
@@ -166,8 +398,8 @@ def get_expanded_regions_by_rule(grid, rule) -> list[ExpandedRegion]:
                                 if i != center_index and (case & (1 << i)) != 0:
                                     other_mines_count += 1
                         else:
-                            is_center_mine = (
-                                grid[center_r][center_c] == SPECIAL_CELLS["flag"]
+                            is_center_mine = bool(
+                                board.mine & board.bit(center_r, center_c)
                             )
                             other_mines_count = existing_mines - int(is_center_mine)
                             other_mines_count += bin(case).count("1")
@@ -1,9 +1,9 @@
 import time
 from itertools import combinations
 from math import comb
+from typing import NamedTuple
 
-import pyautogui
-import pygetwindow as gw
+import numpy as np
 
 from window.const import (
     CLICK_COORDINATES,
@@ -23,14 +23,29 @@ from window.const import (
     TOTAL_MINES,
     MAX_CASES,
 )
-from window.image_utils import PuzzleStatus, capture_window_screenshot, completed_check
+from window.board import (
+    Board,
+    as_board,
+    as_grid,
+    case_to_mask,
+    get_line_masks,
+    get_offset_masks,
+)
+from window.capture import Snapshot, get_window_geometry
+from window.image_utils import (
+    PuzzleStatus,
+    all_solved_probe_table,
+    status_probe_table,
+)
 from window.region import (
     ExpandedRegion,
     Region,
     RuleRegion,
+    sorted_unique_cases,
 )
 from window.rules import (
-    is_valid_case_for_rule,
+    compile_rule,
+    localize_rule,
     filter_cases_by_rule,
     get_expanded_regions_by_rule,
 )
@@ -86,80 +101,52 @@ def get_neighbors(rule):
 
 def get_rule_regions(grid, rule) -> list[Region]:
     # ["V", "X", "X'", "K", "B"]
+    board = as_board(grid)
     regions = []
 
     if rule in ["V", "X", "X'", "K"]:
-        for r in range(len(grid)):
-            for c in range(len(grid[0])):
-                if grid[r][c] >= 0:
-                    mines_needed = grid[r][c]
-                    neighboring_blanks = set()
-                    for dr, dc in NEIGHBORS[rule]:
-                        nr, nc = r + dr, c + dc
-                        if 0 <= nr < len(grid) and 0 <= nc < len(grid[0]):
-                            if grid[nr][nc] == -1:
-                                neighboring_blanks.add((nr, nc))
-                            elif grid[nr][nc] == -2:
-                                mines_needed -= 1
-                    if neighboring_blanks:
-                        regions.append(
-                            Region(
-                                mines_needed=mines_needed,
-                                blank_cells=neighboring_blanks,
-                            )
+        neighbor_masks = get_offset_masks(
+            board.height, board.width, tuple(NEIGHBORS[rule])
+        )
+        for index, neighbor_mask in enumerate(neighbor_masks):
+            if board.number >> index & 1 and board.clues[index] >= 0:
+                neighboring_blanks = neighbor_mask & board.blank
+                if neighboring_blanks:
+                    mines_needed = (
+                        board.clues[index] - (neighbor_mask & board.mine).bit_count()
+                    )
+                    regions.append(
+                        Region(
+                            mines_needed=mines_needed,
+                            blank_cells=set(board.mask_to_cells(neighboring_blanks)),
                         )
+                    )
         return regions
     elif rule == "B":
-        mine_value = get_total_mines(rule, len(grid)) // len(grid)
-        for row in range(len(grid)):
-            mines_needed = mine_value
-            blanks = set()
-            for col in range(len(grid[0])):
-                if grid[row][col] == -2:
-                    mines_needed -= 1
-                elif grid[row][col] == -1:
-                    blanks.add((row, col))
+        mine_value = get_total_mines(rule, board.height) // board.height
+        row_masks, col_masks = get_line_masks(board.height, board.width)
+        for line_mask in row_masks + col_masks:
+            blanks = line_mask & board.blank
             if blanks:
                 regions.append(
                     Region(
-                        mines_needed=mines_needed,
-                        blank_cells=blanks,
-                    )
-                )
-        for col in range(len(grid[0])):
-            mines_needed = mine_value
-            blanks = set()
-            for row in range(len(grid)):
-                if grid[row][col] == -2:
-                    mines_needed -= 1
-                elif grid[row][col] == -1:
-                    blanks.add((row, col))
-            if blanks:
-                regions.append(
-                    Region(
-                        mines_needed=mines_needed,
-                        blank_cells=blanks,
+                        mines_needed=mine_value - (line_mask & board.mine).bit_count(),
+                        blank_cells=set(board.mask_to_cells(blanks)),
                     )
                 )
         return regions
 
 
 def get_grid_region(grid, rule) -> Region:
-    mines_needed = get_total_mines(rule, len(grid))
-    blanks = set()
-    for r in range(len(grid)):
-        for c in range(len(grid[0])):
-            if grid[r][c] == -2:
-                mines_needed -= 1
-            elif grid[r][c] == -1:
-                blanks.add((r, c))
+    board = as_board(grid)
     return Region(
-        mines_needed=mines_needed,
-        blank_cells=blanks,
+        mines_needed=get_total_mines(rule, board.height) - board.mine.bit_count(),
+        blank_cells=set(board.mask_to_cells(board.blank)),
     )
 
 
 def get_all_rule_regions(grid, rule) -> list[Region]:
+    grid = as_board(grid)
     regions = []
     regionable_single = ["Q", "C", "T", "O", "D", "S", "T'", "D'", "A", "H"]
     if rule in regionable_single:
@@ -183,17 +170,18 @@ def get_all_rule_regions(grid, rule) -> list[Region]:
 
 
 def analyze_exregions_by_rule(grid, rule) -> list:
+    board = as_board(grid)
     regions = []
-    rows, cols = len(grid), len(grid[0])
+    rows, cols = board.height, board.width
 
     if rule in ["W", "W'", "L", "P", "M", "N"]:
         region_type = RuleRegion
 
     for r in range(rows):
         for c in range(cols):
-            if grid[r][c] >= 0:
+            if board.value(r, c) >= 0:
                 center = (r, c)
-                cell_value = grid[r][c]
+                cell_value = board.value(r, c)
                 pre_filled_mines = []
                 pre_filled_numbers = []
                 has_blank = False
@@ -205,7 +193,7 @@ def analyze_exregions_by_rule(grid, rule) -> list:
                         if not (0 <= nr < rows) or not (0 <= nc < cols):
                             pre_filled_numbers.append((nr, nc))
                             continue
-                        neighbor_value = grid[nr][nc]
+                        neighbor_value = board.value(nr, nc)
                         if neighbor_value == SPECIAL_CELLS["flag"]:
                             pre_filled_mines.append((nr, nc))
                         elif (
@@ -229,6 +217,7 @@ def analyze_exregions_by_rule(grid, rule) -> list:
 
 
 def analyze_exregions_by_right_side_rules(grid, rule) -> list:
+    grid = as_board(grid)
     exregions = []
     rules_to_check = []
     if "M" in rule:
@@ -250,6 +239,7 @@ def analyze_exregions_by_right_side_rules(grid, rule) -> list:
 
 
 def find_all_area_hints(regions, grid, rule):
+    grid = as_grid(grid)
     hints = set()
     if rule == "UW":
         hints.update(find_flag_adjacent_cells(grid))
@@ -286,59 +276,97 @@ def diff_regions(regions: list[Region]):
             return regions
 
 
+def get_left_side_rules_for_cases(rule, size) -> list[dict]:
+    """expand_regions 에서 조합마다 확인하는 좌측 규칙들"""
+    rules = []
+    if "Q" in rule:
+        rules.append(RULE_Q)
+    if "T" in rule:
+        rules.append(RULE_T)
+    if "D" in rule and "D'" not in rule:
+        # rules.append(RULE_D1)
+        rules.append(RULE_D2)
+    if "B" in rule:
+        rules.append(get_rule_B(size))
+    if "A" in rule:
+        rules.append(RULE_A)
+    if "H" in rule:
+        rules.append(RULE_H)
+    if "U" in rule:
+        rules.append(RULE_U)
+    return rules
+
+
 def expand_regions(regions: list[Region], grid, rule) -> list[ExpandedRegion]:
+    board = as_board(grid)
+    compiled_rules = [
+        compile_rule(rule_dict, board.height, board.width)
+        for rule_dict in get_left_side_rules_for_cases(rule, board.height)
+    ]
     expanded_regions = []
     for region in regions:
-        blank_cells = list(region.blank_cells)
+        ## 정렬해 두고 case 비트를 바로 만들어도 from_mine_combinations 결과와 같음
+        blank_cells = sorted(region.blank_cells)
         combinations_count = comb(len(blank_cells), region.mines_needed)
         if combinations_count > MAX_CASES:
             continue
 
-        valid_mine_combinations = []
-        for mines in combinations(blank_cells, region.mines_needed):
-            numbers = [cell for cell in blank_cells if cell not in mines]
-            applied_grid = [row[:] for row in grid]
-            for row, col in mines:
-                applied_grid[row][col] = SPECIAL_CELLS["flag"]
-            for row, col in numbers:
-                applied_grid[row][col] = SPECIAL_CELLS["star"]
-            if "Q" in rule:
-                if not is_valid_case_for_rule(applied_grid, RULE_Q):
-                    continue
-            if "T" in rule:
-                if not is_valid_case_for_rule(applied_grid, RULE_T):
-                    continue
-            if "D" in rule and "D'" not in rule:
-                # if not is_valid_case_for_rule(applied_grid, RULE_D1):
-                #     continue
-                # if not is_valid_case_for_rule(applied_grid, RULE_D1):
-                #     continue
-                if not is_valid_case_for_rule(applied_grid, RULE_D2):
-                    continue
-            if "B" in rule:
-                if not is_valid_case_for_rule(applied_grid, get_rule_B(len(grid))):
-                    continue
-            if "A" in rule:
-                if not is_valid_case_for_rule(applied_grid, RULE_A):
-                    continue
-            if "H" in rule:
-                if not is_valid_case_for_rule(applied_grid, RULE_H):
-                    continue
-            if "U" in rule:
-                if not is_valid_case_for_rule(applied_grid, RULE_U):
-                    continue
-            valid_mine_combinations.append(mines)
-        if len(valid_mine_combinations) > MAX_CASES:
+        region_mask = board.cells_to_mask(blank_cells)
+        local_rules = [
+            localize_rule(compiled, board, region_mask) for compiled in compiled_rules
+        ]
+        tables = board.get_case_tables(blank_cells)
+        base_mine = board.mine & ~region_mask
+        base_number = board.number & ~region_mask
+        case_bits = [1 << i for i in range(len(blank_cells))]
+        mine_combinations = combinations(case_bits, region.mines_needed)
+        valid_cases = []
+        if None in local_rules:
+            ## region 밖에서 이미 규칙이 깨졌으면 어떤 조합도 안됨
+            pass
+        elif not local_rules:
+            valid_cases = [sum(mines) for mines in mine_combinations]
+        else:
+            for mines in mine_combinations:
+                case = sum(mines)
+                mine_mask = case_to_mask(case, tables)
+                mine = base_mine | mine_mask
+                number = base_number | region_mask ^ mine_mask
+                for compiled in local_rules:
+                    if not compiled.is_valid(mine, number):
+                        break
+                else:
+                    valid_cases.append(case)
+        if len(valid_cases) > MAX_CASES:
             continue
 
-        expanded_region = ExpandedRegion.from_mine_combinations(
-            blank_cells, valid_mine_combinations
-        )
+        expanded_region = ExpandedRegion(blank_cells=blank_cells, cases=valid_cases)
         expanded_regions.append(expanded_region)
 
     return expanded_regions
 
 
+def compact_case_bits(cases: np.ndarray, indices: list[int]) -> np.ndarray:
+    """
+    cases 의 indices 비트들만 0번부터 차례로 모읍니다 (pext 처럼).
+    연속한 비트들은 한번에 옮깁니다.
+    """
+    compacted = np.zeros(len(cases), dtype=np.uint64)
+    new_index = 0
+    run_start = 0
+    while run_start < len(indices):
+        run_end = run_start + 1
+        while run_end < len(indices) and indices[run_end] == indices[run_end - 1] + 1:
+            run_end += 1
+        run_length = run_end - run_start
+        run_mask = np.uint64(((1 << run_length) - 1) << indices[run_start])
+        shift = indices[run_start] - new_index
+        compacted |= (cases & run_mask) >> np.uint64(shift)
+        new_index += run_length
+        run_start = run_end
+    return compacted
+
+
 def extract_hints(
     region: ExpandedRegion,
 ) -> tuple[set[tuple[str, tuple[int, int]]], ExpandedRegion]:
@@ -347,17 +375,14 @@ def extract_hints(
     hints = set()
     uncertain_cells = []
     uncertain_cell_indices = []
-    total_cases = len(region.cases)
-    bit_masks = [1 << i for i in range(len(region.blank_cells))]
-    mine_counts = [0] * len(region.blank_cells)
-    for case in region.cases:
-        for i, mask in enumerate(bit_masks):
-            if case & mask:
-                mine_counts[i] += 1
-    for i, (cell, count) in enumerate(zip(region.blank_cells, mine_counts)):
-        if count == total_cases:
+    cases = region.cases
+    ## case 가 없으면 and 는 전부 1 이라 원래처럼 전부 mine 이 됩니다
+    always_mine = int(np.bitwise_and.reduce(cases))
+    ever_mine = int(np.bitwise_or.reduce(cases))
+    for i, cell in enumerate(region.blank_cells):
+        if always_mine >> i & 1:
             hints.add(("mine", cell))
-        elif count == 0:
+        elif not ever_mine >> i & 1:
             hints.add(("safe", cell))
         else:
             uncertain_cells.append(cell)
@@ -365,55 +390,80 @@ def extract_hints(
     if not hints:
         return set(), region
     if uncertain_cells:
-        mask = sum(1 << i for i in uncertain_cell_indices)
-        seen_patterns = set()
-        new_cases = []
-        for case in region.cases:
-            pattern = case & mask
-            if pattern not in seen_patterns:
-                seen_patterns.add(pattern)
-                new_case = 0
-                for new_idx, old_idx in enumerate(uncertain_cell_indices):
-                    if case & (1 << old_idx):
-                        new_case |= 1 << new_idx
-                new_cases.append(new_case)
-        return hints, ExpandedRegion(blank_cells=uncertain_cells, cases=new_cases)
+        new_cases = sorted_unique_cases(
+            compact_case_bits(cases, uncertain_cell_indices)
+        )
+        return hints, ExpandedRegion.from_sorted_cases(uncertain_cells, new_cases)
 
     return hints, None
 
 
+def remap_case_bits(cases: np.ndarray, targets: list[int]) -> np.ndarray:
+    """
+    i 번째 비트를 targets[i] 번째 비트로 옮깁니다 (targets[i] 가 -1 이면 버림).
+    바이트마다 (0~255 -> 옮긴 비트들) 표를 만들어 두고 표를 찾아 OR 합니다.
+    """
+    remapped = np.zeros(len(cases), dtype=np.uint64)
+    for start in range(0, len(targets), 8):
+        table = np.zeros(1, dtype=np.uint64)
+        for target in targets[start : start + 8]:
+            bit = np.uint64(1 << target if target >= 0 else 0)
+            table = np.concatenate([table, table | bit])
+        byte = (cases >> np.uint64(start)) & np.uint64(0xFF)
+        remapped |= table[byte]
+    return remapped
+
+
 def merge_expanded_regions(r1: ExpandedRegion, r2: ExpandedRegion) -> ExpandedRegion:
+    """
+    두 region 의 case 중 겹치는 칸이 같은 것끼리 합칩니다.
+    겹치는 칸만 뽑은 값(key)으로 r2 를 정렬해 두고 r1 의 key 마다 맞는 구간만 붙입니다.
+    """
     all_cells = list(set(r1.blank_cells) | set(r2.blank_cells))
     all_cells.sort()
-    r1_cell_indices = {}
-    r2_cell_indices = {}
-    for i, cell in enumerate(r1.blank_cells):
-        r1_cell_indices[cell] = i
-    for i, cell in enumerate(r2.blank_cells):
-        r2_cell_indices[cell] = i
-
-    new_cases = []
-    for case1 in r1.cases:
-        for case2 in r2.cases:
-            valid = True
-            new_case = 0
-            for new_idx, cell in enumerate(all_cells):
-                mine1 = None
-                mine2 = None
-                if cell in r1_cell_indices:
-                    idx1 = r1_cell_indices[cell]
-                    mine1 = bool(case1 & (1 << idx1))
-                if cell in r2_cell_indices:
-                    idx2 = r2_cell_indices[cell]
-                    mine2 = bool(case2 & (1 << idx2))
-                if mine1 is not None and mine2 is not None and mine1 != mine2:
-                    valid = False
-                    break
-                if mine1 or mine2:
-                    new_case |= 1 << new_idx
-            if valid:
-                new_cases.append(new_case)
-    if not new_cases:
+    all_indices = {cell: i for i, cell in enumerate(all_cells)}
+    r2_cells = set(r2.blank_cells)
+    shared_cells = [cell for cell in r1.blank_cells if cell in r2_cells]
+    shared_indices = {cell: i for i, cell in enumerate(shared_cells)}
+
+    def get_targets(region):
+        keys = [shared_indices.get(cell, -1) for cell in region.blank_cells]
+        merged = [all_indices[cell] for cell in region.blank_cells]
+        return keys, merged
+
+    keys1, targets1 = get_targets(r1)
+    keys2, targets2 = get_targets(r2)
+    cases1 = r1.cases
+    cases2 = r2.cases
+
+    is_subset = len(shared_cells) == len(r1.blank_cells)
+    is_superset = len(shared_cells) == len(r2.blank_cells)
+    if is_subset or is_superset:
+        ## 한쪽 칸이 다른 쪽에 다 들어 있으면 큰 쪽 case 중 key 가 맞는 것만 남김
+        if is_subset:
+            small, small_keys = cases1, keys1
+            large, large_keys, large_targets = cases2, keys2, targets2
+        else:
+            small, small_keys = cases2, keys2
+            large, large_keys, large_targets = cases1, keys1, targets1
+        matched = np.isin(
+            remap_case_bits(large, large_keys), remap_case_bits(small, small_keys)
+        )
+        new_cases = remap_case_bits(large[matched], large_targets)
+    else:
+        join1 = remap_case_bits(cases1, keys1)
+        join2 = remap_case_bits(cases2, keys2)
+        order = np.argsort(join2, kind="stable")
+        join2 = join2[order]
+        merged2 = remap_case_bits(cases2[order], targets2)
+        starts = np.searchsorted(join2, join1, side="left")
+        counts = np.searchsorted(join2, join1, side="right") - starts
+        total = int(counts.sum())
+        offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        partners = np.repeat(starts, counts) + offsets
+        merged1 = remap_case_bits(cases1, targets1)
+        new_cases = np.repeat(merged1, counts) | merged2[partners]
+    if not len(new_cases):
         return None
 
     return ExpandedRegion(blank_cells=all_cells, cases=new_cases)
@@ -443,6 +493,7 @@ def apply_filter_for_all_rules(
 
 
 def get_expanded_regions_by_left_side_rules(grid, rule):
+    grid = as_board(grid)
     exregions = []
     if "Q" in rule:
         exregions.extend(get_expanded_regions_by_rule(grid, RULE_Q))
@@ -467,6 +518,7 @@ def solve_with_expanded_regions(
     exregions: list[ExpandedRegion], grid: list[list[int]], rule: str
 ) -> set[tuple[str, tuple[int, int]]]:
     logging_this = False
+    grid = as_board(grid)
 
     hints = set()
 
@@ -545,7 +597,8 @@ def solve_with_expanded_regions(
         if time.time() - start_time < 0.5 and hints:
             for i in range(len(exregions)):
                 new_exregion = apply_hints_to_exregion(exregions[i], hints)
-                if new_exregion != exregions[i]:
+                ## 힌트와 맞는 case 가 없으면(None) 그 region 은 그대로 둡니다
+                if new_exregion is not None and new_exregion != exregions[i]:
                     if logging_this:
                         print(
                             f"Hint applied: {exregions[i].case_count} -> {new_exregion.case_count}"
@@ -563,30 +616,30 @@ def apply_hints_to_exregion(
     exregion: ExpandedRegion, hints: set[tuple[str, tuple[int, int]]]
 ) -> ExpandedRegion | None:
     """주어진 힌트들을 exregion에 적용하여 cases를 필터링"""
-    filtered_cases = []
-
-    for case in exregion.cases:
-        valid = True
-        for hint_type, cell in hints:
-            if cell in exregion.blank_cells:
-                idx = exregion.blank_cells.index(cell)
-                has_mine = bool(case & (1 << idx))
-                if (hint_type == "mine" and not has_mine) or (
-                    hint_type == "safe" and has_mine
-                ):
-                    valid = False
-                    break
-        if valid:
-            filtered_cases.append(case)
-
-    if not filtered_cases:
+    cell_indices = {cell: index for index, cell in enumerate(exregion.blank_cells)}
+    mine_bits = safe_bits = 0
+    for hint_type, cell in hints:
+        if cell in cell_indices:
+            if hint_type == "mine":
+                mine_bits |= 1 << cell_indices[cell]
+            elif hint_type == "safe":
+                safe_bits |= 1 << cell_indices[cell]
+
+    cases = exregion.cases
+    valid = (cases & np.uint64(mine_bits)) == np.uint64(mine_bits)
+    valid &= (cases & np.uint64(safe_bits)) == 0
+    filtered_cases = cases[valid]
+
+    if not len(filtered_cases):
         print("이런 경우는 없을듯?")
         return None
 
-    return ExpandedRegion(blank_cells=exregion.blank_cells, cases=filtered_cases)
+    return ExpandedRegion.from_sorted_cases(exregion.blank_cells, filtered_cases)
 
 
-def apply_hints(grid: list[list[int]], hints):
+def apply_hints(grid: Board | list[list[int]], hints):
+    if isinstance(grid, Board):
+        return grid.apply_hints(hints)
     for hint_type, (r, c) in hints:
         if hint_type == "safe":
             grid[r][c] = -3
@@ -595,6 +648,50 @@ def apply_hints(grid: list[list[int]], hints):
     return grid
 
 
+def is_regionable(rule):
+    regionable_single = ["Q", "C", "T", "O", "D", "S", "T'", "D'", "A", "H"]
+    regionable_double = ["V", "B", "X", "X'", "K", "BX", "BX'", "BK"]
+    return rule in (regionable_single + regionable_double)
+
+
+def find_hints(grid, rule) -> set:
+    """
+    인식한 grid 에서 클릭할 힌트를 찾습니다. 못 찾으면 빈 set 을 반환합니다.
+    """
+    grid = as_board(grid)
+    for include_grid in [False, True]:
+        if is_regionable(rule):
+            hint_count = 0
+            hints = set()
+            while True:
+                regions = get_all_rule_regions(grid, rule)
+                if include_grid:
+                    regions.append(get_grid_region(grid, rule))
+                hints.update(find_all_area_hints(regions, grid, rule))
+                if hint_count < len(hints):
+                    hint_count = len(hints)
+                    grid = apply_hints(grid, hints)
+                    continue
+                break
+            if hints:
+                return hints
+            regions = diff_regions(regions)
+            print(f"diff regions: {len(regions)}")
+            hints = find_all_area_hints(regions, grid, rule)
+            if hints:
+                return hints
+        exregions = analyze_exregions_by_right_side_rules(grid, rule)
+        regions = get_all_rule_regions(grid, rule)
+        if include_grid:
+            regions.append(get_grid_region(grid, rule))
+        exregions.extend(expand_regions(regions, grid, rule))
+        exregions.extend(get_expanded_regions_by_left_side_rules(grid, rule))
+        hints = solve_with_expanded_regions(exregions, grid, rule)
+        if hints:
+            return hints
+    return set()
+
+
 def location_to_cell_coordinates(window_title, location, size):
     row, col = location
 
@@ -613,14 +710,17 @@ def location_to_cell_coordinates(window_title, location, size):
 
 
 def activate_window(window_title):
-    target_window = gw.getWindowsWithTitle(window_title)[0]
+    target_window = get_window_geometry(window_title).window
     target_window.activate()
     return True
 
 
 def click_positions(window_title, clicks):
+    import pyautogui  ## 화면이 없으면 import 가 실패해서 클릭할 때만 불러옴
+
+    geometry = get_window_geometry(window_title)
     try:
-        target_window = gw.getWindowsWithTitle(window_title)[0]
+        target_window = geometry.window
         target_window.activate()
         original_x, original_y = pyautogui.position()
         pyautogui.FAILSAFE = False
@@ -628,8 +728,7 @@ def click_positions(window_title, clicks):
         pyautogui.PAUSE = 0.0001
         # pyautogui.PAUSE = 0.3
 
-        base_x = target_window.left
-        base_y = target_window.top
+        base_x, base_y = geometry.refresh_rect()[:2]
         clicks.append(CLICK_COORDINATES["safe_click"])
         pyautogui.moveTo(base_x + 150, base_y + 150)
         for relative_x, relative_y, button_type in clicks:
@@ -645,6 +744,7 @@ def click_positions(window_title, clicks):
 
     except Exception as e:
         print(f"Error clicking positions: {e}")
+        geometry.invalidate()
         return False
 
 
@@ -677,14 +777,17 @@ def click_hints_twice(window_title, hints, size):
 
 
 def input_spacebar(window_title):
-    target_window = gw.getWindowsWithTitle(window_title)[0]
+    import pyautogui
+
+    target_window = get_window_geometry(window_title).window
     target_window.activate()
     pyautogui.press("space")
 
 
-def next_level_check(window_title, save_path):
-    capture_window_screenshot(window_title)
-    status = completed_check(save_path)
+def next_level_check(window_title, snapshot: Snapshot | None = None):
+    if snapshot is None:
+        snapshot = Snapshot(window_title, backend=get_window_geometry(window_title))
+    status = snapshot.probe(status_probe_table)
     if status == PuzzleStatus.FINISH:
         input_spacebar(window_title)
         click_positions(window_title, [CLICK_COORDINATES["next_level"]])
@@ -701,6 +804,8 @@ def next_level_check(window_title, save_path):
     elif status == PuzzleStatus.ALREADY_SOLVED:
         click_positions(window_title, [CLICK_COORDINATES["skip_button"]])
         time.sleep(0.3)
+    if status != PuzzleStatus.INCOMPLETE:
+        snapshot.invalidate()
     return status
 
 
@@ -710,11 +815,67 @@ def skip_level(window_title):
     click_positions(window_title, [skip1, skip2])
 
 
-def process_hints(window_title, hints, size, save_path):
+def process_hints(window_title, hints, size, snapshot: Snapshot | None = None):
     # print(f"{len(hints)} hints found")
     # click_hints(self.window_title, hints, self.cell_size)
     click_hints_twice(window_title, hints, size)
-    next_level_check(window_title, save_path)
+    if snapshot is not None:
+        snapshot.invalidate()
+    next_level_check(window_title, snapshot)
+
+
+## solve_iteration 이 marks 에 시각을 남기는 단계들 (벤치마크용)
+ITERATION_STAGES = ["capture", "status", "board_size", "recognize", "solve"]
+
+
+class IterationResult(NamedTuple):
+    """solve_iteration 한 바퀴의 결과. frame 이 None 이면 이번 문제는 더 풀지 않습니다"""
+
+    all_solved: bool
+    status: PuzzleStatus | None = None
+    frame: np.ndarray | None = None
+    size: int | None = None
+    grid: list[list[int]] | None = None
+    hints: set | None = None
+
+
+def solve_iteration(
+    window_title,
+    rule,
+    snapshot: Snapshot,
+    geometry,
+    recognizer,
+    check_status=next_level_check,
+    marks: list[float] | None = None,
+) -> IterationResult:
+    """
+    process_game_data 의 한 바퀴: 캡쳐 -> 상태 확인 -> 판 크기 -> 인식 -> 힌트 찾기.
+    상태 확인과 인식은 같은 snapshot.frame 을 씁니다.
+    check_status(window_title, snapshot) 가 상태에 따라 클릭하는 유일한 곳입니다.
+    marks 를 주면 ITERATION_STAGES 가 끝날 때마다 time.perf_counter() 를 붙입니다.
+    """
+
+    def mark():
+        if marks is not None:
+            marks.append(time.perf_counter())
+
+    if snapshot.frame is None:
+        return IterationResult(False)
+    mark()
+    if snapshot.probe(all_solved_probe_table):
+        return IterationResult(True)
+    status = check_status(window_title, snapshot)
+    frame = snapshot.frame
+    if status == PuzzleStatus.ALREADY_SOLVED or frame is None:
+        return IterationResult(False, status)
+    mark()
+    size = geometry.board_size(frame)
+    mark()
+    grid = recognizer.recognize_grid(window_title, size, rule, frame)
+    mark()
+    hints = find_hints(grid, rule)
+    mark()
+    return IterationResult(False, status, frame, size, grid, hints)
 
 
 def switch_to_other_size(window_title, click):
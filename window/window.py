@@ -1,4 +1,5 @@
-from PyQt5.QtGui import QPixmap
+import cv2
+from PyQt5.QtGui import QImage, QPixmap
 from PyQt5.QtWidgets import (
     QApplication,
     QFrame,
@@ -11,12 +12,11 @@ from PyQt5.QtWidgets import (
     QWidget,
 )
 
+from window.capture import CaptureThread, Snapshot, get_window_geometry
 from window.image_utils import (
-    capture_window_screenshot,
-    convert_to_numeric,
-    detect_cell_size,
-    find_best_fit_cells,
-    all_solved_check,
+    build_template_index,
+    GridRecognizer,
+    all_solved_probe_table,
     PuzzleStatus,
 )
 from window.hint_utils import (
@@ -28,23 +28,15 @@ from window.utils import (
     ExpandedRegion,
     activate_window,
     # analyze_regions,
-    apply_hints,
-    diff_regions,
-    expand_regions,
-    find_all_area_hints,
-    next_level_check,
+    solve_iteration,
     skip_level,
-    solve_with_expanded_regions,
-    get_grid_region,
     process_hints,
     analyze_exregions_by_rule,
-    analyze_exregions_by_right_side_rules,
-    get_expanded_regions_by_left_side_rules,
     switch_to_other_size,
     get_rule_regions,
-    get_all_rule_regions,
 )
 import time
+from functools import partial
 from random import shuffle
 
 from window.operate_utils import PuzzleVariant
@@ -58,14 +50,23 @@ class HeaderFrame(QFrame):
         layout.addWidget(label)
 
 
+def frame_to_pixmap(frame) -> QPixmap:
+    if frame is None:
+        return QPixmap()
+    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    height, width, channels = rgb.shape
+    image = QImage(rgb.data, width, height, channels * width, QImage.Format_RGB888)
+    return QPixmap.fromImage(image.copy())
+
+
 class ScreenshotFrame(QFrame):
-    def __init__(self, window_title, parent=None):
+    def __init__(self, frame, parent=None):
         super().__init__(parent)
         layout = QVBoxLayout(self)
         self.setLayout(layout)
 
         label = QLabel()
-        label.setPixmap(QPixmap(f"{window_title}.png"))
+        label.setPixmap(frame_to_pixmap(frame))
         layout.addWidget(label)
 
 
@@ -142,7 +143,9 @@ class MyWindow(QMainWindow):
         self.window_title = conf["window_title"]
         self.rule = conf["rule"].upper()
         self.iterate_forever = conf["iterate_forever"]
-        self.cell_size = detect_cell_size(self.window_title)
+        self.debug_dump = conf.get("debug_dump", False)
+        self.last_frame = None
+        self.recognizer = GridRecognizer()
 
         variant_strings = []
 
@@ -173,7 +176,6 @@ class MyWindow(QMainWindow):
                 to_click = next_variant.get_menu_coordinates()
                 switch_to_other_size(self.window_title, to_click)
                 self.variants_to_iterate.append(next_variant)
-                self.cell_size = detect_cell_size(self.window_title)
                 self.rule = next_variant.rule
                 self.skipped_levels = 0
                 while True:
@@ -183,7 +185,9 @@ class MyWindow(QMainWindow):
                     self.skipped_levels += 1
                     if self.skipped_levels >= 5:
                         break
-                    if all_solved_check(self.window_title):
+                    ## 화면이 바뀌기만 기다리는 곳이라 창 전체 대신 영역만 찍음
+                    snapshot = Snapshot(self.window_title, backend=self.window_geometry)
+                    if snapshot.probe(all_solved_probe_table, poll=True):
                         break
                 print("moving to other size")
         else:
@@ -196,7 +200,17 @@ class MyWindow(QMainWindow):
     def update_config_values(self):
         self.window_title = self.conf["window_title"]
         self.rule = self.conf["rule"].upper()
-        self.cell_size = detect_cell_size(self.window_title)
+        build_template_index(self.window_title)
+        self.window_geometry = get_window_geometry(self.window_title)
+        self.capture_backend = self.window_geometry
+        self.cell_size = None
+        if getattr(self, "capture_thread", None) is not None:
+            self.capture_thread.stop()
+        self.capture_thread = None
+        if self.conf.get("capture_thread", False):
+            self.capture_thread = CaptureThread(
+                partial(self.capture_backend.capture, activate=False)
+            )
 
     def setup_ui(self):
         central_widget = QWidget()
@@ -205,7 +219,7 @@ class MyWindow(QMainWindow):
         central_widget.setLayout(main_layout)
 
         self.header_frame = HeaderFrame()
-        self.screenshot_frame = ScreenshotFrame(self.window_title)
+        self.screenshot_frame = ScreenshotFrame(self.last_frame)
         self.text_frame = TextFrame(self.conf)
         self.control_frame = ControlFrame(self.start_new_process)
 
@@ -215,84 +229,49 @@ class MyWindow(QMainWindow):
         main_layout.addWidget(self.control_frame)
 
     def process_game_data(self):
-        save_path = f"{self.window_title}.png"
+        dump_path = f"{self.window_title}.png" if self.debug_dump else None
         activate_window(self.window_title)
+        if self.capture_thread is not None:
+            self.capture_thread.start()
+        snapshot = Snapshot(
+            self.window_title, dump_path, self.capture_backend, self.capture_thread
+        )
 
-        while True:
-            if all_solved_check(self.window_title):
-                break
-            status = next_level_check(self.window_title, save_path)
-            if status == PuzzleStatus.ALREADY_SOLVED:
-                print("skipping level")
-                self.skipped_levels += 1
-                break
-            capture_window_screenshot(self.window_title)
-            best_fit_cells = find_best_fit_cells(
-                self.window_title, self.cell_size, self.rule
-            )
-            grid = convert_to_numeric(best_fit_cells)
-            # if capture_and_stop:
-            # for row in grid:
-            #     for cell in row:
-            #         print(f"{str(cell).rjust(4)}", end=" ")
-            #     print()
-            # return 1 / 0
-            hints_found = False
-
-            def is_regionable(rule):
-                regionable_single = ["Q", "C", "T", "O", "D", "S", "T'", "D'", "A", "H"]
-                regionable_double = ["V", "B", "X", "X'", "K", "BX", "BX'", "BK"]
-                return rule in (regionable_single + regionable_double)
-
-            for include_grid in [False, True]:
-                if is_regionable(self.rule):
-                    hint_count = 0
-                    hints = set()
-                    while True:
-                        regions = get_all_rule_regions(grid, self.rule)
-                        if include_grid:
-                            regions.append(get_grid_region(grid, self.rule))
-                        hints.update(find_all_area_hints(regions, grid, self.rule))
-                        if hint_count < len(hints):
-                            hint_count = len(hints)
-                            grid = apply_hints(grid, hints)
-                            continue
-                        break
-                    if hints:
-                        process_hints(
-                            self.window_title, hints, self.cell_size, save_path
-                        )
-                        hints_found = True
-                        break
-                    regions = diff_regions(regions)
-                    print(f"diff regions: {len(regions)}")
-                    hints = find_all_area_hints(regions, grid, self.rule)
-                    if hints:
-                        process_hints(
-                            self.window_title, hints, self.cell_size, save_path
-                        )
-                        hints_found = True
-                        break
-                exregions = analyze_exregions_by_right_side_rules(grid, self.rule)
-                regions = get_all_rule_regions(grid, self.rule)
-                if include_grid:
-                    regions.append(get_grid_region(grid, self.rule))
-                exregions.extend(expand_regions(regions, grid, self.rule))
-                exregions.extend(
-                    get_expanded_regions_by_left_side_rules(grid, self.rule)
+        try:
+            while True:
+                result = solve_iteration(
+                    self.window_title,
+                    self.rule,
+                    snapshot,
+                    self.window_geometry,
+                    self.recognizer,
                 )
-                hints = solve_with_expanded_regions(exregions, grid, self.rule)
-                if hints:
-                    process_hints(self.window_title, hints, self.cell_size, save_path)
-                    hints_found = True
+                if result.status == PuzzleStatus.ALREADY_SOLVED:
+                    print("skipping level")
+                    self.skipped_levels += 1
+                    break
+                if result.frame is None:
+                    break
+                self.last_frame = result.frame
+                self.cell_size = result.size
+                # if capture_and_stop:
+                # for row in result.grid:
+                #     for cell in row:
+                #         print(f"{str(cell).rjust(4)}", end=" ")
+                #     print()
+                # return 1 / 0
+                if not result.hints:
+                    print("hint not found")
                     break
-            if not hints_found:
-                print("hint not found")
-                break
+                process_hints(self.window_title, result.hints, self.cell_size, snapshot)
+        finally:
+            ## 다음 실행까지 창을 계속 찍지 않도록 멈춤
+            if self.capture_thread is not None:
+                self.capture_thread.stop()
 
     def start_new_process(self):
         if hasattr(self, "text_frame"):
-            self.conf = self.text_frame.get_current_values()
+            self.conf = {**self.conf, **self.text_frame.get_current_values()}
             self.update_config_values()
 
         self.process_game_data()
@@ -301,7 +280,7 @@ class MyWindow(QMainWindow):
             for i in reversed(range(self.screenshot_frame.layout().count())):
                 self.screenshot_frame.layout().itemAt(i).widget().setParent(None)
             label = QLabel()
-            label.setPixmap(QPixmap(f"{self.window_title}.png"))
+            label.setPixmap(frame_to_pixmap(self.last_frame))
             self.screenshot_frame.layout().addWidget(label)
 
     def setup_window_geometry(self):